@@ -1,15 +1,34 @@
 import os
+import time
+import asyncio
+import functools
+import contextvars
 import secrets
-import torch
+import numpy as np
 import logging
-from fastapi import FastAPI, UploadFile, HTTPException, Response
-from faster_whisper import WhisperModel
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from fastapi import FastAPI, UploadFile, HTTPException, Response, Form, Header
+from fastapi.responses import JSONResponse
 from crypto_utils import encrypt_data, decrypt_data
+from audio_utils import preprocess_wav, AudioFormatError, UnsupportedAudioFormat
+from model_registry import (
+    ModelRegistry, LanguageDetector, AUTO_LANGUAGE, is_valid_language, parse_language_models
+)
+from log_utils import setup_logging, log_stage, job_id_var
+from profiling import ProfileSwitch, profile_var
+from load_control import LoadController, default_levels
+from readiness import ReadinessProbe
+from postprocess import TranscriptPostprocessor, Segment
+from keyring_utils import Keyring, KeyContext, UnknownKeyError
+from spool import Spool
+from inference_backend import create_backend
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
+# Настройка логирования: JSON в stderr через очередь, запись в отдельном потоке
+setup_logging(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    fmt=os.getenv("LOG_FORMAT", "json"),
+    sample_rate=float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
 )
 logger = logging.getLogger(__name__)
 
@@ -18,106 +37,358 @@ app = FastAPI()
 # Генерация секретного эндпоинта
 ENDPOINT = os.getenv("SECRET_ENDPOINT", secrets.token_urlsafe(32))
 
-# Загрузка ключей из переменных окружения
+# Загрузка ключей: пара из окружения для шифротекстов без key_id
+# и/или файл набора ключей с key_id, перечитываемый без перезапуска
 KEY_DECRYPT_STR = os.getenv("KEY_DECRYPT")
 KEY_ENCRYPT_STR = os.getenv("KEY_ENCRYPT")
+KEYRING_FILE = os.getenv("KEYRING_FILE")
+
+legacy_key = None
+if KEY_DECRYPT_STR and KEY_ENCRYPT_STR:
+    legacy_key = KeyContext(
+        key_id=None,
+        tenant="default",
+        decrypt_key=bytes.fromhex(KEY_DECRYPT_STR),  # Для входящих файлов
+        encrypt_key=bytes.fromhex(KEY_ENCRYPT_STR)   # Для исходящих текстов
+    )
+
+keyring = Keyring(
+    KEYRING_FILE,
+    legacy=legacy_key,
+    reload_interval=float(os.getenv("KEYRING_RELOAD_INTERVAL", "5")),
+    logger=logger
+)
 
 # Проверка инициализации ключей
-if not KEY_DECRYPT_STR or not KEY_ENCRYPT_STR:
+if not len(keyring):
     raise RuntimeError("Encryption keys not configured!")
 
-KEY_DECRYPT = bytes.fromhex(KEY_DECRYPT_STR)  # Для входящих файлов
-KEY_ENCRYPT = bytes.fromhex(KEY_ENCRYPT_STR)  # Для исходящих текстов
+# Бэкенд распознавания: whisper (устройство выбирается автоматически) или
+# stub - заглушка без GPU и загрузки моделей для тестов конвейера
+model_size = os.getenv("WHISPER_MODEL", "large-v3")
+backend = create_backend(
+    os.getenv("INFERENCE_BACKEND", "whisper"),
+    stub_seconds_per_audio_second=float(os.getenv("STUB_SECONDS_PER_AUDIO_SECOND", "0.05")),
+    stub_load_seconds=float(os.getenv("STUB_LOAD_SECONDS", "0"))
+)
+
+logger.info(
+    "Инициализация Whisper модели",
+    extra={
+        "model": model_size,
+        "backend": backend.name,
+        "device": backend.device,
+        "compute_type": backend.compute_type
+    }
+)
+
+# Модели для отдельных языков задаются как "en=distil-large-v2,de=medium"
+registry = ModelRegistry(
+    model_size,
+    backend,
+    language_models=parse_language_models(os.getenv("LANGUAGE_MODELS", ""))
+)
+# Основная модель загружается сразу, остальные - по первому запросу
+with log_stage(logger, "model_load", model=model_size):
+    registry.get(model_size)
 
-# Инициализация модели Whisper с автоопределением устройства
-model_size = "large-v3"
-device = "cuda" if torch.cuda.is_available() else "cpu"
-compute_type = "float16" if torch.cuda.is_available() else "int8"
+# Язык по умолчанию; "auto" включает автоопределение
+DEFAULT_LANGUAGE = os.getenv("DEFAULT_LANGUAGE", "ru")
 
-print(f"🎯 Инициализация Whisper модели: {model_size}")
-print(f"🖥️  Устройство: {device}")
-print(f"⚙️  Тип вычислений: {compute_type}")
+# Определение языка по первым 30 с; по умолчанию основной моделью
+LANGUAGE_DETECT_MODEL = os.getenv("LANGUAGE_DETECT_MODEL", model_size)
+detector = LanguageDetector(
+    registry,
+    LANGUAGE_DETECT_MODEL,
+    cache_size=int(os.getenv("LANGUAGE_CACHE_SIZE", "256"))
+)
 
-logger.info(f"Инициализация Whisper модели: {model_size}, устройство: {device}, тип: {compute_type}")
+# Пул потоков для тяжёлых этапов, чтобы не блокировать event loop
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", "2"))
+worker_pool = ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix="worker")
+# Отдельный поток для проверки готовности: она не ждёт в очереди за лекциями
+probe_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="probe")
 
-model = WhisperModel(
-    model_size,
-    device=device,
-    compute_type=compute_type
+# Предобработка аудио: даунмикс, ресемплинг в 16 кГц, обрезка тишины
+AUDIO_PREPROCESS = os.getenv("AUDIO_PREPROCESS", "1") == "1"
+SILENCE_THRESHOLD_DB = float(os.getenv("SILENCE_THRESHOLD_DB", "-50"))
+
+# Постобработка транскрипта: повторы, абзацы по паузам, пунктуация.
+# Пустой POSTPROCESS_STAGES возвращает прежний вывод - сегменты построчно
+postprocessor = TranscriptPostprocessor(
+    stages=[stage for stage in os.getenv("POSTPROCESS_STAGES", "repeats,paragraphs,punctuation").split(",") if stage],
+    paragraph_pause=float(os.getenv("POSTPROCESS_PARAGRAPH_PAUSE", "2.0")),
+    max_repeats=int(os.getenv("POSTPROCESS_MAX_REPEATS", "2")),
+    max_phrase_words=int(os.getenv("POSTPROCESS_MAX_PHRASE_WORDS", "20"))
+)
+
+# Временные файлы для аудио, которое не разобрала предобработка: в tmpfs,
+# пока хватает памяти, иначе на диске; файлы безымянные и исчезают сами
+spool = Spool(
+    memory_dir=os.getenv("SPOOL_MEMORY_DIR", "/dev/shm/stenogramma"),
+    disk_dir=os.getenv("SPOOL_DISK_DIR", "temp"),
+    min_free=int(float(os.getenv("SPOOL_MIN_FREE_MB", "1024")) * (1 << 20))
+)
+logger.info(
+    "Каталоги временных файлов",
+    extra={"memory_dir": spool.memory_dir, "disk_dir": spool.disk_dir}
+)
+
+# Снижение качества декодирования под нагрузкой: full -> greedy -> economy
+load_controller = LoadController(
+    default_levels(os.getenv("DEGRADE_MODEL") or None),
+    queue_threshold=int(os.getenv("DEGRADE_QUEUE_DEPTH", "4")),
+    rtf_limit=float(os.getenv("DEGRADE_RTF_LIMIT", "0.5")),
+    max_level=int(os.getenv("DEGRADE_MAX_LEVEL", "2"))
 )
 
-logger.info("Модель Whisper успешно загружена")
+# Профилирование запросов: по заголовку X-Profile-Token, в окне времени или всегда.
+# Без PROFILE_TOKEN и PROFILE_ALL выключено полностью
+profiler_switch = ProfileSwitch(
+    os.getenv("PROFILE_TOKEN"),
+    os.getenv("PROFILE_DIR", "profiles"),
+    interval=float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005")),
+    always=os.getenv("PROFILE_ALL", "0") == "1"
+)
+
+
+async def run_in_executor(executor, func, *args, **kwargs):
+    """Выполняет функцию в пуле потоков с текущим контекстом (job_id)"""
+    loop = asyncio.get_running_loop()
+    profile = profile_var.get()
+    if profile is not None:
+        func = profile.wrap(func)
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(executor, functools.partial(context.run, func, *args, **kwargs))
+
+
+async def run_in_pool(func, *args, **kwargs):
+    """Выполняет функцию в общем пуле задач"""
+    return await run_in_executor(worker_pool, func, *args, **kwargs)
+
+
+def transcribe(audio, language: str, allow_degrade: bool = True, probe: bool = False):
+    """Транскрибирует открытый файл или массив float32 16 кГц моно.
+
+    Настройки декодирования выбираются в момент начала работы по текущей
+    нагрузке. Прогон проверки готовности (probe) идёт без VAD, чтобы модель
+    гарантированно отработала, и не учитывается в RTF.
+    Возвращает (сегменты, язык, имя модели, настройки).
+    """
+    settings = load_controller.choose(allow_degrade and not probe)
+
+    if language == AUTO_LANGUAGE:
+        # Без отдельного прохода язык определит сама модель транскрибации
+        if not isinstance(audio, np.ndarray) or not detector.needed(settings.model, probe):
+            language = None
+        else:
+            with log_stage(logger, "language_detect") as fields:
+                language, probability, cached = detector.detect(audio)
+                fields.update(language=language, probability=round(probability, 3), cached=cached)
+
+    if probe:
+        # Проверка готовности измеряет основную модель, а не модель для языка клипа
+        model_name, selected_model = registry.default_model, registry.get(registry.default_model)
+    elif settings.model:
+        model_name, selected_model = settings.model, registry.get(settings.model)
+    else:
+        model_name, selected_model = registry.for_language(language)
+
+    started = time.perf_counter()
+    segments, info = selected_model.transcribe(
+        audio,
+        language=language,
+        beam_size=settings.beam_size,
+        vad_filter=not probe,
+        vad_parameters=settings.vad_parameters or None
+    )
+    # Сегменты - ленивый генератор, декодирование происходит при итерации
+    segments = [Segment(segment.start, segment.end, segment.text) for segment in segments]
+    if not probe:
+        load_controller.observe(info.duration, time.perf_counter() - started)
+    return segments, info.language, model_name, settings
+
 
 @app.post(f"/{ENDPOINT}")
-async def process_lecture(file: UploadFile):
-    logger.info(f"Получен запрос на обработку файла: {file.filename}")
-    
+async def process_lecture(
+    file: UploadFile,
+    language: Optional[str] = Form(None),
+    allow_degrade: bool = Form(True),
+    x_profile_token: Optional[str] = Header(None)
+):
+    job_id = secrets.token_hex(8)
+    job_id_var.set(job_id)
+    profile = profiler_switch.start(job_id, x_profile_token)
+    profile_var.set(profile)
+    started = time.perf_counter()
+    logger.info("Получен запрос", extra={"upload_name": file.filename})
+
     # 1. Проверка типа файла
     if not file.filename or not file.filename.endswith('.wav'):
-        logger.warning(f"Отклонен файл неподдерживаемого типа: {file.filename}")
+        logger.warning("Отклонен файл неподдерживаемого типа", extra={"upload_name": file.filename})
         raise HTTPException(400, "Only .wav files accepted")
 
-    # Создание директории для временных файлов
-    temp_dir = "temp"
-    os.makedirs(temp_dir, exist_ok=True)
-    
-    # Генерация имени временного файла
-    temp_filename = os.path.join(temp_dir, f"temp_audio_{secrets.token_urlsafe(8)}.wav")
-    logger.debug(f"Создан временный файл: {temp_filename}")
+    language = (language or DEFAULT_LANGUAGE).strip().lower()
+    if not is_valid_language(language):
+        raise HTTPException(400, f"Invalid language: {language}")
+
+    spool_file = None
+    load_controller.enter()
 
     try:
         # 2. Расшифровка аудио
-        logger.info("Чтение зашифрованных данных...")
-        encrypted_audio = await file.read()
-        logger.info(f"Получено {len(encrypted_audio)} байт зашифрованных данных")
-        
-        logger.info("Расшифровка аудио...")
-        decrypted_audio = decrypt_data(encrypted_audio, KEY_DECRYPT)
-        logger.info(f"Расшифровано {len(decrypted_audio)} байт аудиоданных")
-
-        # 3. Сохранение во временный файл
-        logger.info(f"Сохранение во временный файл: {temp_filename}")
-        with open(temp_filename, "wb") as f:
-            f.write(decrypted_audio)
-        logger.info("Временный файл создан успешно")
+        with log_stage(logger, "read") as fields:
+            encrypted_audio = await file.read()
+            fields["bytes"] = len(encrypted_audio)
 
-        # 4. Транскрибация
-        logger.info("Начало транскрибации...")
-        segments, _ = model.transcribe(
-            temp_filename,
-            language="ru",
-            beam_size=5,
-            vad_filter=True
-        )
+        try:
+            key = keyring.resolve(encrypted_audio)
+        except UnknownKeyError as e:
+            logger.warning("Неизвестный ключ", extra={"reason": str(e)})
+            raise HTTPException(403, "Unknown encryption key")
+
+        with log_stage(logger, "decrypt", key_id=key.key_id, tenant=key.tenant) as fields:
+            decrypted_audio = await run_in_pool(decrypt_data, encrypted_audio, key.decrypt_key)
+            del encrypted_audio
+            fields["bytes"] = len(decrypted_audio)
 
-        logger.info("Обработка сегментов транскрибации...")
-        transcript = "\n".join(segment.text for segment in segments)
-        logger.info(f"Транскрибация завершена. Получено {len(transcript)} символов текста")
+        # 3. Предобработка аудио
+        audio = None
+        if AUDIO_PREPROCESS:
+            try:
+                with log_stage(logger, "preprocess") as fields:
+                    audio, stats = await run_in_pool(preprocess_wav, decrypted_audio, SILENCE_THRESHOLD_DB)
+                    fields.update(
+                        source_sample_rate=stats.source_sample_rate,
+                        source_channels=stats.source_channels,
+                        input_seconds=round(stats.input_seconds, 2),
+                        output_seconds=round(stats.output_seconds, 2),
+                        removed_seconds=round(stats.removed_seconds, 2)
+                    )
+            except UnsupportedAudioFormat as e:
+                # Кодек не разбирается NumPy - отдаём файл декодеру faster-whisper
+                logger.warning("Предобработка пропущена", extra={"reason": str(e)})
+            except AudioFormatError as e:
+                logger.warning("Отклонен некорректный WAV", extra={"reason": str(e)})
+                raise HTTPException(400, f"Invalid WAV file: {e}")
 
-        # 5. Шифрование результата
-        logger.info("Шифрование результата...")
-        encrypted_result = encrypt_data(transcript.encode('utf-8'), KEY_ENCRYPT)
-        logger.info(f"Результат зашифрован: {len(encrypted_result)} байт")
+        if audio is None:
+            # Сохранение во временный файл; faster-whisper читает его по дескриптору
+            with log_stage(logger, "spool") as fields:
+                spool_file, fields["spool"] = await run_in_pool(spool.write, decrypted_audio)
+            audio = spool_file
+        del decrypted_audio
 
-        # 6. Очистка
-        if os.path.exists(temp_filename):
-            os.remove(temp_filename)
-            logger.debug(f"Временный файл удален: {temp_filename}")
+        # 4. Транскрибация
+        with log_stage(logger, "transcribe") as fields:
+            segments, language, model_name, settings = await run_in_pool(
+                transcribe, audio, language, allow_degrade
+            )
+            fields.update(
+                language=language,
+                model=model_name,
+                decode_profile=settings.name,
+                beam_size=settings.beam_size,
+                segments=len(segments),
+                queue_depth=load_controller.pending,
+                rtf_ewma=load_controller.rtf and round(load_controller.rtf, 3)
+            )
 
-        logger.info("Обработка файла завершена успешно")
+        # 5. Постобработка текста
+        with log_stage(logger, "postprocess") as fields:
+            transcript, stats = await run_in_pool(postprocessor.run, segments)
+            fields.update(stats, chars=len(transcript))
+
+        # 6. Шифрование результата
+        with log_stage(logger, "encrypt") as fields:
+            # Ответ шифруется парным ключом того же key_id
+            encrypted_result = encrypt_data(transcript.encode('utf-8'), key.encrypt_key, key.key_id)
+            fields["bytes"] = len(encrypted_result)
+
+        logger.info(
+            "Обработка файла завершена",
+            extra={"duration_ms": round((time.perf_counter() - started) * 1000, 1)}
+        )
         return Response(
             content=encrypted_result,
             media_type="application/octet-stream",
-            headers={"Content-Disposition": "attachment;filename=encrypted_result.bin"}
+            headers={
+                "Content-Disposition": "attachment;filename=encrypted_result.bin",
+                "X-Job-Id": job_id,
+                "X-Decode-Profile": settings.name
+            }
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Ошибка при обработке файла: {str(e)}", exc_info=True)
-        # Очистка в случае ошибки
-        if os.path.exists(temp_filename):
-            os.remove(temp_filename)
-            logger.debug(f"Временный файл удален после ошибки: {temp_filename}")
+        logger.error("Ошибка при обработке файла", exc_info=True)
         raise HTTPException(500, f"Processing error: {str(e)}")
+    finally:
+        load_controller.leave()
+        # 7. Очистка
+        if spool_file is not None:
+            spool_file.close()
+        if profile is not None:
+            profile_var.set(None)
+            try:
+                path = await run_in_pool(profile.save)
+                logger.info("Профиль сохранён", extra={"profile_path": path})
+            except Exception:
+                logger.warning("Не удалось сохранить профиль", exc_info=True)
+
+@app.post(f"/{ENDPOINT}/profile")
+async def open_profile_window(seconds: float = 60, x_profile_token: Optional[str] = Header(None)):
+    """Включает профилирование всех запросов на seconds секунд"""
+    if not profiler_switch.check_token(x_profile_token):
+        raise HTTPException(403, "Forbidden")
+    seconds = min(max(seconds, 0), 3600)
+    profiler_switch.open_window(seconds)
+    logger.warning("Открыто окно профилирования", extra={"seconds": seconds})
+    return {"profiling_seconds": seconds}
+
+async def run_probe_pipeline(encrypted_audio: bytes) -> bytes:
+    """Те же этапы, что и у запроса: расшифровка, предобработка, транскрибация,
+    постобработка, шифрование. Выполняется в своём потоке, поэтому ожидание
+    свободного потока в worker_pool не входит в замер задержки
+    """
+    key = keyring.resolve(encrypted_audio)
+    decrypted_audio = await run_in_executor(probe_pool, decrypt_data, encrypted_audio, key.decrypt_key)
+    audio, _ = await run_in_executor(probe_pool, preprocess_wav, decrypted_audio, SILENCE_THRESHOLD_DB)
+    segments, *_ = await run_in_executor(probe_pool, transcribe, audio, PROBE_LANGUAGE, probe=True)
+    transcript, _ = await run_in_executor(probe_pool, postprocessor.run, segments)
+    return await run_in_executor(
+        probe_pool, encrypt_data, transcript.encode('utf-8'), key.encrypt_key, key.key_id
+    )
+
+# Язык клипа задаётся явно, чтобы проверка не тратила время на определение языка
+PROBE_LANGUAGE = "en" if DEFAULT_LANGUAGE == AUTO_LANGUAGE else DEFAULT_LANGUAGE
+
+# Клип шифруется клиентским ключом, ответ проверяется расшифровкой; ключ
+# выбирается заново перед каждым прогоном, поэтому переживает ротацию
+readiness_probe = ReadinessProbe(
+    run_probe_pipeline,
+    key_provider=keyring.any_context,
+    clip_seconds=float(os.getenv("READINESS_CLIP_SECONDS", "5")),
+    interval=float(os.getenv("READINESS_INTERVAL", "60")),
+    max_latency=float(os.getenv("READINESS_MAX_LATENCY", "10")),
+    max_rtf=float(os.getenv("READINESS_MAX_RTF", "1.0"))
+)
+
+@app.on_event("startup")
+async def start_readiness_probe():
+    app.state.readiness_task = asyncio.create_task(readiness_probe.run_forever())
+
+@app.on_event("startup")
+async def start_spool_janitor():
+    # Уборка файлов, оставшихся после аварийного завершения, не задерживает старт
+    app.state.janitor_task = asyncio.create_task(run_in_pool(spool.reclaim_orphans))
+
+@app.get("/ready")
+async def get_readiness():
+    """Готовность по последнему прогону клипа: 200 или 503"""
+    ready, result = readiness_probe.status()
+    return JSONResponse(result, status_code=200 if ready else 503)
 
 @app.get("/endpoint_info")
 async def get_endpoint():
@@ -0,0 +1,346 @@
+"""
+Предобработка аудио перед транскрибацией: разбор WAV, даунмикс,
+полифазный ресемплинг в 16 кГц моно и обрезка тишины по краям
+"""
+
+import io
+import os
+import struct
+from dataclasses import dataclass
+from math import gcd
+from typing import BinaryIO, Iterator
+
+import numpy as np
+
+# Частота дискретизации, с которой работает Whisper
+TARGET_SAMPLE_RATE = 16000
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# Размер блока выходных отсчётов при ресемплинге (ограничивает пиковую память)
+RESAMPLE_CHUNK = 1 << 16
+
+# Размер блока входных кадров при потоковом чтении файла
+STREAM_FRAMES = 1 << 16
+
+
+class AudioFormatError(ValueError):
+    """Файл не является корректным WAV"""
+
+
+class UnsupportedAudioFormat(AudioFormatError):
+    """Корректный WAV, но кодек не поддерживается предобработкой"""
+
+
+@dataclass
+class WavInfo:
+    format_tag: int
+    channels: int
+    sample_rate: int
+    bits_per_sample: int
+    data_offset: int
+    data_size: int
+
+    @property
+    def frame_size(self) -> int:
+        return self.channels * (self.bits_per_sample // 8)
+
+
+@dataclass
+class PreprocessStats:
+    source_sample_rate: int
+    source_channels: int
+    input_seconds: float
+    output_seconds: float
+    trimmed_leading_seconds: float
+    trimmed_trailing_seconds: float
+
+    @property
+    def removed_seconds(self) -> float:
+        return self.trimmed_leading_seconds + self.trimmed_trailing_seconds
+
+
+def parse_wav_header(data: bytes) -> WavInfo:
+    """Разбирает RIFF/WAVE заголовок и находит блок данных"""
+    return read_wav_info(io.BytesIO(data), len(data))
+
+
+def read_wav_info(f: BinaryIO, total_size: int) -> WavInfo:
+    """Разбирает заголовок WAV из файлового объекта, не читая сами отсчёты"""
+    riff = f.read(12)
+    if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+        raise AudioFormatError("Not a RIFF/WAVE file")
+
+    fmt = None
+    offset = 12
+    while offset + 8 <= total_size:
+        f.seek(offset)
+        chunk_id, chunk_size = struct.unpack("<4sI", f.read(8))
+        body = offset + 8
+
+        if chunk_id == b"fmt ":
+            if chunk_size < 16:
+                raise AudioFormatError("Truncated fmt chunk")
+            fmt_body = f.read(min(chunk_size, 40))
+            format_tag, channels, sample_rate, _, _, bits = struct.unpack_from("<HHIIHH", fmt_body)
+            # WAVE_FORMAT_EXTENSIBLE хранит настоящий кодек в первых байтах GUID
+            if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt_body) >= 40:
+                format_tag = struct.unpack_from("<H", fmt_body, 24)[0]
+            fmt = (format_tag, channels, sample_rate, bits)
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise AudioFormatError("data chunk before fmt chunk")
+            format_tag, channels, sample_rate, bits = fmt
+            # Потоковые записи оставляют размер 0 или 0xFFFFFFFF - берём всё, что есть
+            available = total_size - body
+            size = available if chunk_size in (0, 0xFFFFFFFF) else min(chunk_size, available)
+            info = WavInfo(format_tag, channels, sample_rate, bits, body, size)
+            _validate(info)
+            return info
+
+        # Блоки выровнены по чётной границе
+        offset = body + chunk_size + (chunk_size & 1)
+
+    raise AudioFormatError("No data chunk found")
+
+
+def _validate(info: WavInfo):
+    if info.channels < 1 or info.sample_rate < 1:
+        raise AudioFormatError("Invalid channel count or sample rate")
+    if info.format_tag == WAVE_FORMAT_PCM and info.bits_per_sample in (8, 16, 24, 32):
+        return
+    if info.format_tag == WAVE_FORMAT_IEEE_FLOAT and info.bits_per_sample in (32, 64):
+        return
+    raise UnsupportedAudioFormat(
+        f"Unsupported WAV encoding: format 0x{info.format_tag:04x}, {info.bits_per_sample} bit"
+    )
+
+
+def decode_samples(data: bytes, info: WavInfo) -> np.ndarray:
+    """Преобразует блок данных в массив float32 формы (кадры, каналы)"""
+    size = info.data_size - info.data_size % info.frame_size
+    return decode_frames(memoryview(data)[info.data_offset:info.data_offset + size], info)
+
+
+def decode_frames(raw, info: WavInfo) -> np.ndarray:
+    """Преобразует целое число кадров PCM в массив float32 формы (кадры, каналы)"""
+    bits = info.bits_per_sample
+
+    if info.format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        samples = np.frombuffer(raw, dtype="<f4" if bits == 32 else "<f8").astype(np.float32)
+    elif bits == 8:
+        # 8-битный PCM беззнаковый
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif bits == 16:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif bits == 24:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        packed = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        # Расширение знака 24 -> 32 бит
+        samples = ((packed << 8) >> 8).astype(np.float32) / 8388608.0
+    else:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+
+    return samples.reshape(-1, info.channels)
+
+
+def downmix(samples: np.ndarray) -> np.ndarray:
+    """Сводит многоканальный сигнал в моно"""
+    if samples.ndim == 1:
+        return samples
+    if samples.shape[1] == 1:
+        return samples[:, 0]
+    return samples.mean(axis=1, dtype=np.float32)
+
+
+def _polyphase_filter(up: int, down: int):
+    """ФНЧ с окном Кайзера, разложенный на `up` фаз"""
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    n = np.arange(-half_len, half_len + 1, dtype=np.float64)
+    h = np.sinc(n / max_rate) * np.kaiser(2 * half_len + 1, 5.0)
+    # Единичное усиление на постоянном токе после вставки нулей
+    h *= up / h.sum()
+
+    taps = -(-len(h) // up)
+    h = np.concatenate([h, np.zeros(taps * up - len(h))])
+    # phases[p, k] = h[p + k * up]
+    return h.reshape(taps, up).T.astype(np.float32), half_len
+
+
+class StreamingResampler:
+    """Полифазный ресемплинг моно сигнала по блокам с компенсацией задержки фильтра.
+
+    Хранит только хвост входа длиной в фильтр, поэтому память не зависит
+    от длительности записи. Результат совпадает с обработкой сигнала целиком.
+    """
+
+    def __init__(self, orig_sr: int, target_sr: int = TARGET_SAMPLE_RATE):
+        g = gcd(orig_sr, target_sr)
+        self.up, self.down = target_sr // g, orig_sr // g
+        self.passthrough = self.up == self.down
+        if not self.passthrough:
+            self.phases, self.half_len = _polyphase_filter(self.up, self.down)
+            self.taps = self.phases.shape[1]
+            # Буфер начинается с нулей слева от первого отсчёта
+            self._buffer = np.zeros(self.taps - 1, dtype=np.float32)
+            self._buffer_start = -(self.taps - 1)
+        self._received = 0
+        self._emitted = 0
+
+    def process(self, x: np.ndarray) -> np.ndarray:
+        """Принимает очередной блок и возвращает все готовые выходные отсчёты"""
+        x = x.astype(np.float32, copy=False)
+        self._received += len(x)
+        if self.passthrough:
+            return x
+        self._buffer = np.concatenate([self._buffer, x])
+        available = self._buffer_start + len(self._buffer)
+        # Последний m, для которого (m * down + half_len) // up < available
+        ready = (available * self.up - self.half_len + self.down - 1) // self.down
+        return self._emit(max(ready, self._emitted))
+
+    def flush(self) -> np.ndarray:
+        """Дополняет вход нулями и возвращает оставшиеся отсчёты"""
+        if self.passthrough:
+            return np.zeros(0, dtype=np.float32)
+        total = -(-self._received * self.up // self.down)
+        last_base = ((total - 1) * self.down + self.half_len) // self.up
+        missing = last_base - (self._buffer_start + len(self._buffer)) + 1
+        if missing > 0:
+            self._buffer = np.concatenate([self._buffer, np.zeros(missing, dtype=np.float32)])
+        return self._emit(max(total, self._emitted))
+
+    def _emit(self, stop: int) -> np.ndarray:
+        out = np.empty(stop - self._emitted, dtype=np.float32)
+        k = np.arange(self.taps)
+        for start in range(self._emitted, stop, RESAMPLE_CHUNK):
+            m = np.arange(start, min(start + RESAMPLE_CHUNK, stop), dtype=np.int64)
+            t = m * self.down + self.half_len
+            base = t // self.up - self._buffer_start
+            window = self._buffer[base[:, None] - k[None, :]]
+            offset = start - self._emitted
+            out[offset:offset + len(m)] = np.einsum("ij,ij->i", window, self.phases[t % self.up])
+        self._emitted = stop
+
+        # Отбрасываем вход, который больше не попадёт ни в одно окно
+        keep_from = (self._emitted * self.down + self.half_len) // self.up - (self.taps - 1)
+        drop = keep_from - self._buffer_start
+        if drop > 0:
+            self._buffer = self._buffer[drop:]
+            self._buffer_start = keep_from
+        return out
+
+
+def resample_poly(x: np.ndarray, orig_sr: int, target_sr: int = TARGET_SAMPLE_RATE) -> np.ndarray:
+    """Полифазный ресемплинг моно сигнала целиком"""
+    resampler = StreamingResampler(orig_sr, target_sr)
+    head = resampler.process(x)
+    tail = resampler.flush()
+    return np.concatenate([head, tail]) if len(tail) else head
+
+
+def trim_silence(x: np.ndarray, sample_rate: int, threshold_db: float = -50.0,
+                 frame_ms: int = 30, pad_ms: int = 250):
+    """Обрезает тишину в начале и конце сигнала.
+
+    Возвращает (обрезанный сигнал, отсчётов срезано в начале, отсчётов срезано в конце).
+    Если громких кадров нет совсем, сигнал не трогается - решение остаётся за VAD.
+    """
+    frame = max(1, sample_rate * frame_ms // 1000)
+    n_frames = len(x) // frame
+    if n_frames == 0:
+        return x, 0, 0
+
+    frames = x[:n_frames * frame].reshape(n_frames, frame)
+    energy_db = 10.0 * np.log10(np.einsum("ij,ij->i", frames, frames) / frame + 1e-12)
+    voiced = np.flatnonzero(energy_db > threshold_db)
+    if len(voiced) == 0:
+        return x, 0, 0
+
+    pad = sample_rate * pad_ms // 1000
+    start = max(0, int(voiced[0]) * frame - pad)
+    end = min(len(x), (int(voiced[-1]) + 1) * frame + pad)
+    return x[start:end], start, len(x) - end
+
+
+def preprocess_wav(data: bytes, threshold_db: float = -50.0, chunk_frames: int = STREAM_FRAMES):
+    """Полный конвейер: заголовок -> float32 -> моно -> 16 кГц -> обрезка тишины.
+
+    Блок данных проходит декодирование, даунмикс и ресемплинг частями по
+    chunk_frames кадров; целиком в памяти находится только результат 16 кГц моно.
+    """
+    info = parse_wav_header(data)
+    frames = info.data_size // info.frame_size
+    resampler = StreamingResampler(info.sample_rate, TARGET_SAMPLE_RATE)
+    # Длина выхода известна заранее: блоки пишутся на место, без списка и конкатенации
+    audio = np.empty(-(-frames * resampler.up // resampler.down), dtype=np.float32)
+    filled = 0
+    view = memoryview(data)
+    for start in range(0, frames, chunk_frames):
+        offset = info.data_offset + start * info.frame_size
+        raw = view[offset:offset + min(chunk_frames, frames - start) * info.frame_size]
+        block = resampler.process(downmix(decode_frames(raw, info)))
+        audio[filled:filled + len(block)] = block
+        filled += len(block)
+    tail = resampler.flush()
+    audio[filled:filled + len(tail)] = tail
+    audio = audio[:filled + len(tail)]
+    trimmed, lead, trail = trim_silence(audio, TARGET_SAMPLE_RATE, threshold_db)
+
+    stats = PreprocessStats(
+        source_sample_rate=info.sample_rate,
+        source_channels=info.channels,
+        input_seconds=frames / info.sample_rate,
+        output_seconds=len(trimmed) / TARGET_SAMPLE_RATE,
+        trimmed_leading_seconds=lead / TARGET_SAMPLE_RATE,
+        trimmed_trailing_seconds=trail / TARGET_SAMPLE_RATE,
+    )
+    return np.ascontiguousarray(trimmed), stats
+
+
+def stream_wav_to_pcm16(path: str, chunk_frames: int = STREAM_FRAMES) -> Iterator[bytes]:
+    """Потоково читает WAV и отдаёт 16 кГц моно 16-битный WAV по частям.
+
+    Первой частью идёт заголовок, дальше - блоки отсчётов. В памяти
+    одновременно находится только один блок входа и хвост фильтра.
+    """
+    total_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        info = read_wav_info(f, total_size)
+        frames = info.data_size // info.frame_size
+        resampler = StreamingResampler(info.sample_rate, TARGET_SAMPLE_RATE)
+        out_frames = -(-frames * resampler.up // resampler.down)
+        yield pcm16_wav_header(out_frames, TARGET_SAMPLE_RATE)
+
+        f.seek(info.data_offset)
+        remaining = frames
+        while remaining > 0:
+            count = min(chunk_frames, remaining)
+            raw = f.read(count * info.frame_size)
+            count = len(raw) // info.frame_size
+            if count == 0:
+                break
+            remaining -= count
+            mono = downmix(decode_frames(raw[:count * info.frame_size], info))
+            yield to_pcm16(resampler.process(mono))
+        yield to_pcm16(resampler.flush())
+
+
+def to_pcm16(x: np.ndarray) -> bytes:
+    """Преобразует float32 в 16-битный PCM с насыщением"""
+    return (np.clip(x, -1.0, 1.0) * 32767.0).astype("<i2").tobytes()
+
+
+def pcm16_wav_header(frames: int, sample_rate: int, channels: int = 1) -> bytes:
+    """Заголовок канонического 44-байтного WAV для 16-битного PCM"""
+    data_size = frames * channels * 2
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE",
+        b"fmt ", 16, WAVE_FORMAT_PCM, channels, sample_rate,
+        sample_rate * channels * 2, channels * 2, 16,
+        b"data", data_size,
+    )
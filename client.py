@@ -5,9 +5,11 @@
 
 import os
 import sys
+import secrets
 import argparse
+import itertools
 import requests
-from crypto_utils import encrypt_data, decrypt_data
+from crypto_utils import encrypt_data, encrypt_stream, decrypt_data
 
 def load_env_vars():
     """Загружает переменные окружения"""
@@ -24,6 +26,7 @@ def load_env_vars():
         secret_endpoint = os.getenv('SECRET_ENDPOINT')
         key_encrypt = os.getenv('KEY_DECRYPT')  # Для клиента это ключ шифрования
         key_decrypt = os.getenv('KEY_ENCRYPT')  # Для клиента это ключ расшифровки
+        key_id = os.getenv('KEY_ID')  # Идентификатор ключа в наборе ключей сервера (опционально)
         
         if not all([secret_endpoint, key_encrypt, key_decrypt]):
             raise ValueError("Не все переменные окружения настроены")
@@ -33,7 +36,7 @@ def load_env_vars():
         assert key_encrypt is not None
         assert key_decrypt is not None
             
-        return server_url, secret_endpoint, bytes.fromhex(key_encrypt), bytes.fromhex(key_decrypt)
+        return server_url, secret_endpoint, bytes.fromhex(key_encrypt), bytes.fromhex(key_decrypt), key_id
         
     except Exception as e:
         print(f"❌ Ошибка загрузки конфигурации: {e}")
@@ -42,16 +45,51 @@ def load_env_vars():
         print("- KEY_DECRYPT")
         print("- KEY_ENCRYPT")
         print("- SERVER_URL (опционально, по умолчанию http://localhost:8000)")
+        print("- KEY_ID (опционально, если сервер использует набор ключей)")
         sys.exit(1)
 
-def encrypt_audio_file(file_path, key):
-    """Шифрует аудиофайл"""
+def preprocess_audio_file(file_path):
+    """Возвращает поток частей аудио в моно 16 кГц; файл не загружается целиком"""
     try:
+        from audio_utils import stream_wav_to_pcm16
+    except ImportError as e:
+        print(f"❌ Для предобработки нужен numpy: {e}")
+        sys.exit(1)
+
+    try:
+        parts = stream_wav_to_pcm16(file_path)
+        # Заголовок читается сразу, чтобы ошибка формата проявилась до отправки
+        header = next(parts)
+    except Exception as e:
+        print(f"❌ Ошибка предобработки аудио: {e}")
+        sys.exit(1)
+
+    def counted():
+        size = 0
+        for part in itertools.chain([header], parts):
+            size += len(part)
+            yield part
+        print(f"🎚️  Аудио сведено в моно 16 кГц: {os.path.getsize(file_path)} -> {size} байт")
+
+    return counted()
+
+def encrypt_audio_file(file_path, key, preprocess=False, key_id=None):
+    """Шифрует аудиофайл.
+
+    С предобработкой возвращает поток зашифрованных частей: сведение,
+    шифрование и отправка идут по мере чтения файла, и память клиента
+    не зависит от длины записи.
+    """
+    try:
+        if preprocess:
+            print(f"📁 Файл {file_path} будет сведён и зашифрован потоково при отправке")
+            return encrypt_stream(preprocess_audio_file(file_path), key, key_id)
+        
         with open(file_path, 'rb') as f:
             audio_data = f.read()
         
         print(f"📁 Загружен файл: {file_path} ({len(audio_data)} байт)")
-        encrypted_data = encrypt_data(audio_data, key)
+        encrypted_data = encrypt_data(audio_data, key, key_id)
         print(f"🔐 Файл зашифрован ({len(encrypted_data)} байт)")
         
         return encrypted_data
@@ -59,17 +97,48 @@ def encrypt_audio_file(file_path, key):
         print(f"❌ Ошибка шифрования файла: {e}")
         sys.exit(1)
 
-def send_to_server(encrypted_data, server_url, endpoint, original_filename):
-    """Отправляет зашифрованные данные на сервер"""
-    try:
-        url = f"{server_url}/{endpoint}"
-        print(f"🌐 Отправка на сервер: {url}")
-        
+def multipart_stream(boundary, data, filename, chunks):
+    """Тело multipart/form-data, собираемое на лету из полей и потока частей файла"""
+    for name, value in data.items():
+        yield f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode('utf-8')
+    yield (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f'Content-Type: audio/wav\r\n\r\n'
+    ).encode('utf-8')
+    yield from chunks
+    yield f'\r\n--{boundary}--\r\n'.encode('utf-8')
+
+def post_encrypted_audio(encrypted_data, server_url, endpoint, original_filename, language=None,
+                         allow_degrade=True, timeout=1300, session=None):
+    """Один POST на секретный эндпоинт; возвращает ответ requests без обработки.
+
+    encrypted_data - байты или поток частей; поток отправляется chunked,
+    не накапливаясь в памяти.
+    """
+    data = {'allow_degrade': 'true' if allow_degrade else 'false'}
+    if language:
+        data['language'] = language
+    url = f"{server_url}/{endpoint}"
+    
+    if isinstance(encrypted_data, (bytes, bytearray)):
         files = {
             'file': (f"encrypted_{original_filename}", encrypted_data, 'audio/wav')
         }
+        return (session or requests).post(url, files=files, data=data, timeout=timeout)
+    
+    boundary = secrets.token_hex(16)
+    body = multipart_stream(boundary, data, f"encrypted_{original_filename}", encrypted_data)
+    headers = {'Content-Type': f'multipart/form-data; boundary={boundary}'}
+    return (session or requests).post(url, data=body, headers=headers, timeout=timeout)
+
+def send_to_server(encrypted_data, server_url, endpoint, original_filename, language=None, allow_degrade=True):
+    """Отправляет зашифрованные данные на сервер"""
+    try:
+        print(f"🌐 Отправка на сервер: {server_url}/{endpoint}")
         
-        response = requests.post(url, files=files, timeout=1300)  # 15 минут таймаут
+        response = post_encrypted_audio(
+            encrypted_data, server_url, endpoint, original_filename, language, allow_degrade
+        )
         
         if response.status_code == 200:
             print("✅ Файл успешно обработан сервером")
@@ -111,6 +180,12 @@ def main():
     parser = argparse.ArgumentParser(description='Клиент для безопасной транскрибации аудио')
     parser.add_argument('audio_file', help='Путь к аудиофайлу (.wav)')
     parser.add_argument('-o', '--output', help='Файл для сохранения транскрипта (по умолчанию: transcript.txt)')
+    parser.add_argument('-l', '--language',
+                        help='Язык лекции (ru, en, ...) или auto для автоопределения (по умолчанию: настройка сервера)')
+    parser.add_argument('--no-degrade', action='store_true',
+                        help='Запретить серверу упрощать декодирование под нагрузкой (дольше, но точнее)')
+    parser.add_argument('-p', '--preprocess', action='store_true',
+                        help='Свести аудио в моно 16 кГц перед шифрованием (уменьшает размер загрузки, нужен numpy)')
     
     args = parser.parse_args()
     
@@ -130,17 +205,19 @@ def main():
     print("=" * 50)
     
     # Загрузка конфигурации
-    server_url, secret_endpoint, encrypt_key, decrypt_key = load_env_vars()
+    server_url, secret_endpoint, encrypt_key, decrypt_key, key_id = load_env_vars()
     
     # Шифрование файла
-    encrypted_audio = encrypt_audio_file(args.audio_file, encrypt_key)
+    encrypted_audio = encrypt_audio_file(args.audio_file, encrypt_key, args.preprocess, key_id)
     
     # Отправка на сервер
     encrypted_result = send_to_server(
         encrypted_audio, 
         server_url, 
         secret_endpoint, 
-        os.path.basename(args.audio_file)
+        os.path.basename(args.audio_file),
+        args.language,
+        not args.no_degrade
     )
     
     # Расшифровка результата
@@ -2,14 +2,49 @@ from Crypto.Cipher import AES
 from Crypto.Util.Padding import pad, unpad
 import os
 
-def encrypt_data(data: bytes, key: bytes) -> bytes:
+# Заголовок с идентификатором ключа: MAGIC + длина (1 байт) + key_id в ASCII
+KEY_ID_MAGIC = b"SKID"
+
+def encrypt_data(data: bytes, key: bytes, key_id: str = None) -> bytes:
     iv = os.urandom(16)
     cipher = AES.new(key, AES.MODE_CBC, iv)
     padded_data = pad(data, AES.block_size)
-    return iv + cipher.encrypt(padded_data)
+    header = key_id_header(key_id) if key_id else b""
+    return header + iv + cipher.encrypt(padded_data)
+
+def encrypt_stream(chunks, key: bytes, key_id: str = None):
+    """Шифрует поток частей в тот же формат, что encrypt_data; дополнение - только у последней"""
+    iv = os.urandom(16)
+    cipher = AES.new(key, AES.MODE_CBC, iv)
+    yield (key_id_header(key_id) if key_id else b"") + iv
+    tail = b""
+    for chunk in chunks:
+        data = tail + chunk
+        aligned = len(data) - len(data) % AES.block_size
+        if aligned:
+            yield cipher.encrypt(data[:aligned])
+        tail = data[aligned:]
+    yield cipher.encrypt(pad(tail, AES.block_size))
 
 def decrypt_data(encrypted_data: bytes, key: bytes) -> bytes:
-    iv = encrypted_data[:16]
-    ciphertext = encrypted_data[16:]
+    _, body_offset = read_key_id(encrypted_data)
+    iv = encrypted_data[body_offset:body_offset + 16]
+    ciphertext = encrypted_data[body_offset + 16:]
     cipher = AES.new(key, AES.MODE_CBC, iv)
     return unpad(cipher.decrypt(ciphertext), AES.block_size)
+
+def key_id_header(key_id: str) -> bytes:
+    raw = key_id.encode("ascii")
+    if not 0 < len(raw) < 256:
+        raise ValueError("key_id must be 1-255 ASCII characters")
+    return KEY_ID_MAGIC + bytes([len(raw)]) + raw
+
+def read_key_id(encrypted_data: bytes):
+    """Возвращает (key_id или None для старого формата, смещение IV)"""
+    if encrypted_data[:4] != KEY_ID_MAGIC or len(encrypted_data) < 5:
+        return None, 0
+    length = encrypted_data[4]
+    key_id = bytes(encrypted_data[5:5 + length])
+    if len(key_id) != length:
+        return None, 0
+    return key_id.decode("ascii", errors="replace"), 5 + length
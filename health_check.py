@@ -19,6 +19,10 @@ class HealthChecker:
         print("🔧 Проверка переменных окружения...")
         
         required_vars = ['SECRET_ENDPOINT', 'KEY_DECRYPT', 'KEY_ENCRYPT']
+        keyring_file = os.getenv('KEYRING_FILE')
+        if keyring_file:
+            # С набором ключей пара KEY_DECRYPT/KEY_ENCRYPT не обязательна
+            required_vars = ['SECRET_ENDPOINT']
         missing_vars = []
         
         for var in required_vars:
@@ -29,6 +33,18 @@ class HealthChecker:
             self.errors.append(f"Отсутствуют переменные окружения: {', '.join(missing_vars)}")
             return False
         
+        if keyring_file:
+            try:
+                from keyring_utils import load_keyring_file
+                keys = load_keyring_file(keyring_file)
+                print(f"🔑 Набор ключей {keyring_file}: {len(keys)} активных ключей")
+            except Exception as e:
+                self.errors.append(f"Ошибка чтения набора ключей {keyring_file}: {e}")
+                return False
+            if not (os.getenv('KEY_DECRYPT') and os.getenv('KEY_ENCRYPT')):
+                print("✅ Переменные окружения настроены корректно")
+                return True
+        
         # Проверка длины ключей
         try:
             key_decrypt = os.getenv('KEY_DECRYPT')
@@ -128,28 +144,58 @@ class HealthChecker:
             self.errors.append(f"Ошибка подключения к серверу: {e}")
             return False
     
+    def check_inference_latency(self, server_url="http://localhost:8000"):
+        """Проверка реальной задержки транскрибации по пробе готовности сервера"""
+        print(f"⏱️  Проверка задержки транскрибации {server_url}...")
+        
+        try:
+            response = requests.get(f"{server_url}/ready", timeout=10)
+            data = response.json()
+            
+            if "error" in data:
+                self.errors.append(f"Проба транскрибации не пройдена: {data['error']}")
+                return False
+            
+            latency = data["latency_seconds"]
+            rtf = data["rtf"]
+            details = (f"задержка {latency:.2f} с (порог {data['max_latency_seconds']} с), "
+                       f"RTF {rtf:.2f} (порог {data['max_rtf']})")
+            
+            if response.status_code == 200 and data.get("ready"):
+                print(f"✅ Модель отвечает: {details}")
+                return True
+            else:
+                self.errors.append(f"Транскрибация медленнее порогов: {details}. "
+                                   "Возможно, модель зависла или GPU перешёл на CPU")
+                return False
+                
+        except requests.exceptions.ConnectionError:
+            self.warnings.append("Сервер не запущен, задержка транскрибации не проверена")
+            return False
+        except Exception as e:
+            self.errors.append(f"Ошибка проверки задержки транскрибации: {e}")
+            return False
+    
     def check_temp_directory(self):
-        """Проверка временной директории"""
+        """Проверка каталогов временных файлов"""
         print("📁 Проверка временной директории...")
         
         try:
-            temp_dir = "temp"
-            os.makedirs(temp_dir, exist_ok=True)
+            from spool import Spool
+            spool = Spool(
+                memory_dir=os.getenv("SPOOL_MEMORY_DIR", "/dev/shm/stenogramma"),
+                disk_dir=os.getenv("SPOOL_DISK_DIR", "temp")
+            )
+            if not spool.memory_dir:
+                self.warnings.append("tmpfs для временных файлов недоступен, используется диск")
             
-            # Проверка записи
-            test_file = os.path.join(temp_dir, "test_write.tmp")
-            with open(test_file, "w") as f:
-                f.write("test")
-            
-            # Проверка чтения
-            with open(test_file, "r") as f:
+            # Проверка записи и чтения безымянного файла
+            f, kind = spool.write(b"test")
+            with f:
                 content = f.read()
             
-            # Очистка
-            os.remove(test_file)
-            
-            if content == "test":
-                print("✅ Временная директория работает корректно")
+            if content == b"test":
+                print(f"✅ Временная директория работает корректно ({kind})")
                 return True
             else:
                 self.errors.append("Ошибка записи/чтения во временную директорию")
@@ -170,7 +216,8 @@ class HealthChecker:
             self.check_crypto,
             self.check_temp_directory,
             self.check_gpu,
-            self.check_server
+            self.check_server,
+            self.check_inference_latency
         ]
         
         passed = 0
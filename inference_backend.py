@@ -0,0 +1,123 @@
+"""
+Бэкенды распознавания: настоящий faster-whisper и детерминированная
+заглушка, которая тратит заданное время на секунду аудио и не требует
+GPU и загрузки моделей
+"""
+
+import io
+import os
+import time
+from typing import NamedTuple
+import numpy as np
+from audio_utils import read_wav_info, AudioFormatError
+
+SAMPLE_RATE = 16000
+# Длина сегмента заглушки в секундах (окно Whisper)
+STUB_SEGMENT_SECONDS = 30.0
+
+
+class StubSegment(NamedTuple):
+    start: float
+    end: float
+    text: str
+
+
+class StubInfo(NamedTuple):
+    language: str
+    language_probability: float
+    duration: float
+
+
+class WhisperBackend:
+    """faster-whisper; устройство и тип вычислений выбираются по наличию CUDA"""
+
+    name = "whisper"
+
+    def __init__(self, device: str = None, compute_type: str = None):
+        # torch и faster-whisper импортируются только для настоящего бэкенда
+        import torch
+        cuda = torch.cuda.is_available()
+        self.device = device or ("cuda" if cuda else "cpu")
+        self.compute_type = compute_type or ("float16" if cuda else "int8")
+
+    def load(self, model_name: str):
+        from faster_whisper import WhisperModel
+        return WhisperModel(model_name, device=self.device, compute_type=self.compute_type)
+
+
+class StubBackend:
+    """Заглушка для нагрузочных тестов очереди, шифрования и ввода-вывода.
+
+    Модель «декодирует» ровно seconds_per_audio_second секунд на секунду
+    аудио, засыпая при итерации сегментов, как настоящая модель считает при
+    итерации генератора. Загрузка модели занимает load_seconds.
+    """
+
+    name = "stub"
+    device = "none"
+    compute_type = "none"
+
+    def __init__(self, seconds_per_audio_second: float = 0.05, load_seconds: float = 0.0,
+                 detected_language: str = "ru"):
+        self.seconds_per_audio_second = seconds_per_audio_second
+        self.load_seconds = load_seconds
+        self.detected_language = detected_language
+
+    def load(self, model_name: str):
+        time.sleep(self.load_seconds)
+        return StubModel(model_name, self.seconds_per_audio_second, self.detected_language)
+
+
+class StubModel:
+    """Повторяет интерфейс WhisperModel.transcribe, используемый приложением"""
+
+    def __init__(self, model_name: str, seconds_per_audio_second: float, detected_language: str):
+        self.model_name = model_name
+        self.seconds_per_audio_second = seconds_per_audio_second
+        self.detected_language = detected_language
+
+    def transcribe(self, audio, language=None, beam_size=5, vad_filter=False, vad_parameters=None, **kwargs):
+        duration = audio_duration(audio)
+        info = StubInfo(
+            language=language or self.detected_language,
+            language_probability=1.0 if language else 0.99,
+            duration=duration
+        )
+        return self._segments(duration), info
+
+    def _segments(self, duration: float):
+        start = 0.0
+        while start < duration:
+            end = min(start + STUB_SEGMENT_SECONDS, duration)
+            time.sleep((end - start) * self.seconds_per_audio_second)
+            yield StubSegment(start, end, f" Фрагмент с {start:.0f} по {end:.0f} секунду.")
+            start = end
+
+
+def audio_duration(audio) -> float:
+    """Длительность массива 16 кГц, пути или открытого файла WAV; 0 для нечитаемого WAV"""
+    if isinstance(audio, np.ndarray):
+        return len(audio) / SAMPLE_RATE
+    if isinstance(audio, (str, os.PathLike)):
+        with open(audio, "rb") as f:
+            return audio_duration(f)
+
+    position = audio.tell()
+    try:
+        total_size = audio.seek(0, io.SEEK_END)
+        audio.seek(0)
+        info = read_wav_info(audio, total_size)
+        return info.data_size / (info.frame_size * info.sample_rate)
+    except (AudioFormatError, ZeroDivisionError):
+        return 0.0
+    finally:
+        audio.seek(position)
+
+
+def create_backend(name: str, stub_seconds_per_audio_second: float = 0.05, stub_load_seconds: float = 0.0):
+    """Бэкенд по имени из INFERENCE_BACKEND"""
+    if name == WhisperBackend.name:
+        return WhisperBackend()
+    if name == StubBackend.name:
+        return StubBackend(stub_seconds_per_audio_second, stub_load_seconds)
+    raise ValueError(f"Unknown inference backend: {name!r}")
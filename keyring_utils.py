@@ -0,0 +1,155 @@
+"""
+Набор ключей клиентов: несколько активных ключей на арендатора, выбор по
+key_id из заголовка шифротекста и перечитывание файла без перезапуска
+"""
+
+import os
+import json
+import time
+import threading
+from dataclasses import dataclass
+from typing import Optional
+from Crypto.Hash import SHA256
+from Crypto.Protocol.KDF import HKDF
+from crypto_utils import read_key_id
+
+
+@dataclass(frozen=True)
+class KeyContext:
+    key_id: Optional[str]
+    tenant: str
+    decrypt_key: bytes  # Для входящих файлов
+    encrypt_key: bytes  # Для исходящих текстов
+
+
+class UnknownKeyError(KeyError):
+    """key_id отсутствует в наборе или ключ отключён"""
+
+
+def derive_keys(key_id: str, secret_hex: str):
+    """Выводит пару (ключ запросов, ключ ответов) из общего секрета через HKDF-SHA256"""
+    return HKDF(
+        bytes.fromhex(secret_hex), 32, b"", SHA256, num_keys=2,
+        context=b"stenogramma:" + key_id.encode("ascii")
+    )
+
+
+def _derive_context(key_id: str, tenant: str, material: tuple) -> KeyContext:
+    """Строит контекст ключа.
+
+    material - ("pair", decrypt_hex, encrypt_hex) или ("secret", secret_hex);
+    из общего секрета пара ключей выводится через HKDF-SHA256.
+    """
+    if material[0] == "secret":
+        decrypt_key, encrypt_key = derive_keys(key_id, material[1])
+    else:
+        decrypt_key, encrypt_key = bytes.fromhex(material[1]), bytes.fromhex(material[2])
+    if len(decrypt_key) != 32 or len(encrypt_key) != 32:
+        raise ValueError(f"Key {key_id}: keys must be 32 bytes")
+    return KeyContext(key_id, tenant, decrypt_key, encrypt_key)
+
+
+def _read_keyring(path: str, derived: dict):
+    """Читает файл ключей, переиспользуя контексты из derived для неизменных ключей.
+
+    derived - словарь (key_id, tenant, material) -> KeyContext прошлого чтения.
+    Возвращает (контексты по key_id, новый derived только с активными ключами),
+    чтобы отключённые и удалённые ключи не оставались в памяти.
+    """
+    with open(path, "r") as f:
+        entries = json.load(f)["keys"]
+
+    contexts, fresh = {}, {}
+    for key_id, entry in entries.items():
+        if not entry.get("active", True):
+            continue
+        if "secret" in entry:
+            material = ("secret", entry["secret"])
+        else:
+            material = ("pair", entry["decrypt"], entry["encrypt"])
+        cache_key = (key_id, entry.get("tenant", "default"), material)
+        context = derived.get(cache_key) or _derive_context(*cache_key)
+        contexts[key_id] = fresh[cache_key] = context
+    return contexts, fresh
+
+
+def load_keyring_file(path: str) -> dict:
+    """Читает JSON вида {"keys": {"<key_id>": {"tenant": ..., "decrypt": hex, "encrypt": hex}}}.
+
+    Вместо пары decrypt/encrypt можно указать "secret" - общий секрет для HKDF.
+    Ключи с "active": false пропускаются.
+    """
+    return _read_keyring(path, {})[0]
+
+
+class Keyring:
+    """Ключи из файла плюс необязательный ключ старого формата без key_id.
+
+    Файл проверяется не чаще раза в reload_interval секунд; при ошибке
+    чтения остаётся прежний набор. Задачи держат свой KeyContext, поэтому
+    удаление ключа не ломает уже принятые запросы.
+    """
+
+    def __init__(self, path: Optional[str] = None, legacy: Optional[KeyContext] = None,
+                 reload_interval: float = 5.0, logger=None):
+        self.path = path
+        self.legacy = legacy
+        self.reload_interval = reload_interval
+        self.logger = logger
+        self._contexts = {}
+        # Выведенные контексты прошлого чтения: HKDF не повторяется для неизменных ключей
+        self._derived = {}
+        self._mtime = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        if path:
+            self._contexts, self._derived = _read_keyring(path, self._derived)
+            self._mtime = os.stat(path).st_mtime_ns
+            self._checked = time.monotonic()
+
+    def __len__(self):
+        return len(self._contexts) + (1 if self.legacy else 0)
+
+    def _maybe_reload(self):
+        if not self.path or time.monotonic() - self._checked < self.reload_interval:
+            return
+        with self._lock:
+            if time.monotonic() - self._checked < self.reload_interval:
+                return
+            self._checked = time.monotonic()
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+                if mtime == self._mtime:
+                    return
+                self._contexts, self._derived = _read_keyring(self.path, self._derived)
+                self._mtime = mtime
+                if self.logger:
+                    self.logger.info("Набор ключей перечитан", extra={"keys": len(self._contexts)})
+            except Exception as e:
+                if self.logger:
+                    self.logger.error("Не удалось перечитать набор ключей", extra={"reason": str(e)})
+
+    def get(self, key_id: Optional[str]) -> KeyContext:
+        if key_id is None:
+            if self.legacy is None:
+                raise UnknownKeyError("Ciphertext has no key id")
+            return self.legacy
+        self._maybe_reload()
+        context = self._contexts.get(key_id)
+        if context is None:
+            raise UnknownKeyError(f"Unknown key id: {key_id}")
+        return context
+
+    def resolve(self, encrypted_data: bytes) -> KeyContext:
+        """Выбирает ключ по заголовку шифротекста"""
+        key_id, _ = read_key_id(encrypted_data)
+        return self.get(key_id)
+
+    def any_context(self) -> KeyContext:
+        """Ключ для служебных прогонов: старый, если задан, иначе первый из файла"""
+        if self.legacy is not None:
+            return self.legacy
+        self._maybe_reload()
+        for context in self._contexts.values():
+            return context
+        raise UnknownKeyError("Keyring has no active keys")
@@ -0,0 +1,82 @@
+"""
+Адаптивное снижение нагрузки: при росте очереди и замедлении обработки
+новые задачи получают более дешёвые настройки декодирования
+"""
+
+import threading
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class DecodeSettings:
+    name: str
+    beam_size: int
+    # None - модель выбирается по языку как обычно
+    model: Optional[str] = None
+    vad_parameters: dict = field(default_factory=dict)
+
+
+def default_levels(economy_model: Optional[str] = None):
+    """Уровни от полного качества к самому дешёвому"""
+    return [
+        DecodeSettings("full", beam_size=5),
+        DecodeSettings("greedy", beam_size=1),
+        # Более строгий VAD отбрасывает короткие паузы и шум раньше декодера
+        DecodeSettings(
+            "economy",
+            beam_size=1,
+            model=economy_model,
+            vad_parameters={"threshold": 0.6, "min_silence_duration_ms": 500, "speech_pad_ms": 200}
+        ),
+    ]
+
+
+class LoadController:
+    """Следит за числом задач в работе и скользящим средним real-time factor.
+
+    Уровень растёт на единицу за каждые queue_threshold задач в очереди и
+    ещё на единицу, если обработка медленнее rtf_limit. max_level ограничивает
+    деградацию сверху, а клиент может отказаться от неё совсем.
+    """
+
+    def __init__(self, levels, queue_threshold: int = 4, rtf_limit: float = 0.5,
+                 max_level: Optional[int] = None, smoothing: float = 0.2):
+        self.levels = levels
+        self.queue_threshold = queue_threshold
+        self.rtf_limit = rtf_limit
+        self.max_level = len(levels) - 1 if max_level is None else min(max_level, len(levels) - 1)
+        self.smoothing = smoothing
+        self.pending = 0
+        self.rtf = None
+        self._lock = threading.Lock()
+
+    def enter(self):
+        """Задача принята: учитывается в очереди до вызова leave"""
+        with self._lock:
+            self.pending += 1
+
+    def leave(self):
+        with self._lock:
+            self.pending -= 1
+
+    def observe(self, audio_seconds: float, processing_seconds: float):
+        """Обновляет скользящее среднее RTF по завершённой транскрибации"""
+        if audio_seconds <= 0:
+            return
+        rtf = processing_seconds / audio_seconds
+        with self._lock:
+            self.rtf = rtf if self.rtf is None else self.rtf + self.smoothing * (rtf - self.rtf)
+
+    def level(self) -> int:
+        with self._lock:
+            pending, rtf = self.pending, self.rtf
+        # Текущая задача тоже учтена в pending
+        level = (pending - 1) // self.queue_threshold if self.queue_threshold > 0 else 0
+        if rtf is not None and rtf > self.rtf_limit and pending > 1:
+            level += 1
+        return max(0, min(level, self.max_level))
+
+    def choose(self, allow_degrade: bool = True) -> DecodeSettings:
+        """Выбирает настройки для задачи, которая начинает транскрибацию"""
+        return self.levels[self.level() if allow_degrade else 0]
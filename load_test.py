@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Генератор нагрузки и soak-тест: запросы поступают по открытой модели
+(расписание не ждёт ответов) с заданной интенсивностью и смесью длительностей
+аудио; в отчёте пропускная способность, перцентили задержки, ошибки и RSS сервера
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from client import load_env_vars, post_encrypted_audio
+from crypto_utils import encrypt_data, decrypt_data
+
+
+def parse_mix(text):
+    """Разбирает смесь вида "30:6,300:3,lecture.wav:1" в [(секунды или путь, вес)]"""
+    mix = []
+    for item in text.split(","):
+        source, _, weight = item.strip().rpartition(":")
+        if not source:
+            source, weight = weight, "1"
+        mix.append((source if source.lower().endswith(".wav") else float(source), float(weight)))
+    return mix
+
+
+def build_payloads(mix, key, key_id=None):
+    """Готовит зашифрованные файлы заранее, чтобы шифрование не тормозило генератор.
+
+    Возвращает [(имя, длительность аудио в секундах, вес, шифротекст)].
+    """
+    payloads = []
+    for source, weight in mix:
+        if isinstance(source, str):
+            # audio_utils и readiness тянут numpy - он нужен только при их использовании
+            from audio_utils import parse_wav_header
+            with open(source, "rb") as f:
+                audio = f.read()
+            info = parse_wav_header(audio)
+            seconds = info.data_size / (info.frame_size * info.sample_rate)
+            name = os.path.basename(source)
+        else:
+            from readiness import synthetic_clip
+            audio = synthetic_clip(source)
+            seconds = source
+            name = f"synthetic_{source:g}s.wav"
+        payloads.append((name, seconds, weight, encrypt_data(audio, key, key_id)))
+        print(f"📁 {name}: {seconds:.0f} с аудио, {len(audio)} байт, вес {weight:g}")
+    return payloads
+
+
+def percentile(sorted_values, q):
+    """Перцентиль по ближайшему рангу; None для пустой выборки"""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(q / 100 * len(sorted_values)) - 1)]
+
+
+def find_server_pid(container=None):
+    """PID uvicorn с app:app на этой машине или главного процесса контейнера Docker"""
+    if container:
+        try:
+            output = subprocess.run(
+                ["docker", "inspect", "-f", "{{.State.Pid}}", container],
+                capture_output=True, text=True, timeout=10
+            ).stdout.strip()
+            return int(output) or None
+        except (OSError, ValueError, subprocess.SubprocessError):
+            return None
+    candidates = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                args = f.read().split(b"\0")
+        except OSError:
+            continue
+        if any(b"uvicorn" in arg for arg in args) and b"app:app" in args:
+            candidates.append(int(entry))
+    # Обёртки (timeout, sh -c) тоже совпадают по командной строке; сервер - самый большой
+    return max(candidates, key=lambda pid: read_rss(pid) or 0, default=None)
+
+
+def read_rss(pid):
+    """VmRSS процесса в байтах; None, если процесс недоступен"""
+    if not pid:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _round(value):
+    return None if value is None else round(value, 3)
+
+
+class Stats:
+    """Результаты запросов за интервал или ступень нагрузки"""
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = {}
+        self.sent = 0
+        self.audio_seconds = 0.0
+        self.started = time.monotonic()
+
+    def record(self, latency, seconds, error=None):
+        if error:
+            self.errors[error] = self.errors.get(error, 0) + 1
+        else:
+            self.latencies.append(latency)
+            self.audio_seconds += seconds
+
+    def summary(self, in_flight=0, rss=None):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        latencies = sorted(self.latencies)
+        failed = sum(self.errors.values())
+        done = len(latencies) + failed
+        return {
+            "elapsed_seconds": round(elapsed, 1),
+            "sent": self.sent,
+            "ok": len(latencies),
+            "failed": failed,
+            "error_rate": round(failed / done, 4) if done else 0.0,
+            "errors": dict(self.errors),
+            "throughput_rps": round(len(latencies) / elapsed, 4),
+            # Секунд аудио, обработанных за секунду реального времени
+            "audio_throughput": round(self.audio_seconds / elapsed, 3),
+            "latency_p50": _round(percentile(latencies, 50)),
+            "latency_p95": _round(percentile(latencies, 95)),
+            "latency_p99": _round(percentile(latencies, 99)),
+            "latency_max": _round(latencies[-1] if latencies else None),
+            "in_flight": in_flight,
+            "server_rss_mb": rss and round(rss / (1 << 20), 1),
+        }
+
+
+class LoadGenerator:
+    """Отправляет запросы по расписанию Пуассона (или равномерному) независимо от ответов.
+
+    Задержка считается от запланированного момента отправки, поэтому
+    перегруженный генератор не скрывает очередь. Сверх max_in_flight запросы
+    не отправляются и учитываются как ошибка client_overload.
+    """
+
+    def __init__(self, payloads, server_url, endpoint, decrypt_key, language=None,
+                 allow_degrade=True, timeout=1300.0, max_in_flight=64, verify=True,
+                 arrivals="poisson", server_pid=None, output=None, seed=None):
+        self.payloads = payloads
+        self.weights = [payload[2] for payload in payloads]
+        self.server_url = server_url
+        self.endpoint = endpoint
+        self.decrypt_key = decrypt_key
+        self.language = language
+        self.allow_degrade = allow_degrade
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self.verify = verify
+        self.arrivals = arrivals
+        self.server_pid = server_pid
+        self.output = output
+        self.random = random.Random(seed)
+        self.pool = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="load")
+        self.local = threading.local()
+        self.in_flight = 0
+        self.window = Stats()
+        self.step = Stats()
+        self.rss = []
+
+    def _session(self):
+        # Своя сессия в каждом потоке: соединения переиспользуются, но не делятся
+        if not hasattr(self.local, "session"):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def _send(self, payload):
+        """Отправляет один файл; возвращает None при успехе или метку ошибки"""
+        name, _, _, encrypted = payload
+        try:
+            response = post_encrypted_audio(
+                encrypted, self.server_url, self.endpoint, name, self.language,
+                self.allow_degrade, timeout=self.timeout, session=self._session()
+            )
+        except requests.exceptions.Timeout:
+            return "timeout"
+        except requests.exceptions.ConnectionError:
+            return "connection"
+        if response.status_code != 200:
+            return f"http_{response.status_code}"
+        if self.verify:
+            try:
+                decrypt_data(response.content, self.decrypt_key).decode("utf-8")
+            except Exception:
+                return "bad_response"
+        return None
+
+    async def _request(self, payload, scheduled):
+        loop = asyncio.get_running_loop()
+        self.in_flight += 1
+        try:
+            error = await loop.run_in_executor(self.pool, self._send, payload)
+        except Exception as e:
+            error = type(e).__name__
+        finally:
+            self.in_flight -= 1
+        latency = time.monotonic() - scheduled
+        for stats in (self.window, self.step):
+            stats.record(latency, payload[1], error)
+
+    def _interval(self, rate):
+        if self.arrivals == "uniform":
+            return 1.0 / rate
+        return self.random.expovariate(rate)
+
+    def _report(self, kind, stats, **fields):
+        rss = read_rss(self.server_pid)
+        if rss is not None:
+            self.rss.append(rss)
+        summary = dict(stats.summary(self.in_flight, rss), kind=kind, time=time.time(), **fields)
+        if self.output:
+            with open(self.output, "a") as f:
+                f.write(json.dumps(summary) + "\n")
+        return summary
+
+    async def _reporter(self, interval, rate):
+        while True:
+            await asyncio.sleep(interval)
+            window, self.window = self.window, Stats()
+            summary = self._report("window", window, rate=rate)
+            print(format_line(summary))
+
+    async def run_step(self, rate, duration, report_interval):
+        """Одна ступень: rate запросов в секунду в течение duration секунд"""
+        self.window, self.step = Stats(), Stats()
+        reporter = asyncio.create_task(self._reporter(report_interval, rate))
+        tasks = set()
+        started = time.monotonic()
+        scheduled = started
+        while True:
+            scheduled += self._interval(rate)
+            if scheduled - started >= duration:
+                break
+            await asyncio.sleep(max(0.0, scheduled - time.monotonic()))
+            for stats in (self.window, self.step):
+                stats.sent += 1
+            if self.in_flight >= self.max_in_flight:
+                for stats in (self.window, self.step):
+                    stats.record(0.0, 0.0, "client_overload")
+                continue
+            payload = self.random.choices(self.payloads, weights=self.weights)[0]
+            task = asyncio.create_task(self._request(payload, scheduled))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        # Ответы на уже отправленные запросы тоже входят в ступень
+        if tasks:
+            print(f"⏳ Ожидание {len(tasks)} незавершённых запросов...")
+            await asyncio.wait(set(tasks))
+        reporter.cancel()
+        return self._report("step", self.step, rate=rate)
+
+
+def format_line(summary):
+    def seconds(value):
+        return "-" if value is None else f"{value:.2f}"
+
+    rss = summary["server_rss_mb"]
+    return (
+        f"📈 {summary['rate']:g} req/s | отправлено {summary['sent']}, ok {summary['ok']}, "
+        f"ошибок {summary['failed']} ({summary['error_rate']:.1%}) | "
+        f"{summary['throughput_rps']:.3f} req/s, {summary['audio_throughput']:.1f} с аудио/с | "
+        f"p50 {seconds(summary['latency_p50'])} p95 {seconds(summary['latency_p95'])} "
+        f"p99 {seconds(summary['latency_p99'])} с | в полёте {summary['in_flight']} | "
+        f"RSS {'-' if rss is None else f'{rss:.0f} МБ'}"
+    )
+
+
+async def run(generator, rates, duration, report_interval):
+    results = []
+    for rate in rates:
+        print(f"\n🚀 Ступень {rate:g} req/s на {duration:g} с")
+        summary = await generator.run_step(rate, duration, report_interval)
+        print(format_line(summary))
+        if summary["errors"]:
+            print(f"   Ошибки: {summary['errors']}")
+        results.append(summary)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Генератор нагрузки и soak-тест сервиса транскрибации')
+    parser.add_argument('-r', '--rate', default='0.1',
+                        help='Интенсивность в запросах в секунду; несколько через запятую - ступени (по умолчанию: 0.1)')
+    parser.add_argument('-d', '--duration', type=float, default=600,
+                        help='Длительность каждой ступени в секундах (по умолчанию: 600)')
+    parser.add_argument('-m', '--mix', default='30:6,300:3,1800:1',
+                        help='Смесь файлов "секунды:вес" (синтетическая речь) или "файл.wav:вес" (по умолчанию: 30:6,300:3,1800:1)')
+    parser.add_argument('--arrivals', choices=['poisson', 'uniform'], default='poisson',
+                        help='Распределение моментов отправки (по умолчанию: poisson)')
+    parser.add_argument('--max-in-flight', type=int, default=64,
+                        help='Предел одновременных запросов генератора (по умолчанию: 64)')
+    parser.add_argument('--report-interval', type=float, default=60,
+                        help='Период промежуточного отчёта в секундах (по умолчанию: 60)')
+    parser.add_argument('--timeout', type=float, default=1300,
+                        help='Таймаут одного запроса в секундах (по умолчанию: 1300)')
+    parser.add_argument('-l', '--language', help='Язык запросов (по умолчанию: настройка сервера)')
+    parser.add_argument('--no-degrade', action='store_true',
+                        help='Запретить серверу упрощать декодирование под нагрузкой')
+    parser.add_argument('--no-verify', action='store_true',
+                        help='Не расшифровывать ответы (экономит CPU генератора)')
+    parser.add_argument('--server-pid', type=int,
+                        help='PID сервера для замера RSS (по умолчанию: поиск uvicorn app:app)')
+    parser.add_argument('--container', help='Имя контейнера Docker для замера RSS сервера')
+    parser.add_argument('-o', '--output', help='Файл JSON Lines для промежуточных и итоговых отчётов')
+    parser.add_argument('--seed', type=int, help='Зерно генератора случайных чисел')
+
+    args = parser.parse_args()
+
+    try:
+        rates = [float(rate) for rate in args.rate.split(",")]
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        print(f"❌ Некорректные параметры нагрузки: {e}")
+        sys.exit(1)
+    if any(rate <= 0 for rate in rates):
+        print("❌ Интенсивность должна быть положительной")
+        sys.exit(1)
+
+    print("🏋️ Генератор нагрузки Stenogramma")
+    print("=" * 50)
+
+    server_url, secret_endpoint, encrypt_key, decrypt_key, key_id = load_env_vars()
+    payloads = build_payloads(mix, encrypt_key, key_id)
+
+    server_pid = args.server_pid or find_server_pid(args.container)
+    if server_pid:
+        print(f"🔎 RSS сервера снимается с PID {server_pid}")
+    else:
+        print("⚠️  Процесс сервера не найден, RSS не замеряется")
+
+    generator = LoadGenerator(
+        payloads,
+        server_url,
+        secret_endpoint,
+        decrypt_key,
+        language=args.language,
+        allow_degrade=not args.no_degrade,
+        timeout=args.timeout,
+        max_in_flight=args.max_in_flight,
+        verify=not args.no_verify,
+        arrivals=args.arrivals,
+        server_pid=server_pid,
+        output=args.output,
+        seed=args.seed
+    )
+
+    try:
+        results = asyncio.run(run(generator, rates, args.duration, args.report_interval))
+    except KeyboardInterrupt:
+        print("\n⛔ Прервано")
+        sys.exit(1)
+
+    print("\n" + "=" * 50)
+    print("📊 Итог по ступеням:")
+    for summary in results:
+        print(format_line(summary))
+    if generator.rss:
+        rss_mb = [rss / (1 << 20) for rss in generator.rss]
+        # Рост RSS за прогон - главный признак утечки на длинном soak-тесте
+        print(f"🧠 RSS сервера: начало {rss_mb[0]:.0f} МБ, конец {rss_mb[-1]:.0f} МБ, максимум {max(rss_mb):.0f} МБ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Структурированное логирование: JSON-записи, идентификатор задачи во всех
+этапах, неблокирующая запись через очередь и сэмплирование
+"""
+
+import json
+import time
+import zlib
+import atexit
+import queue
+import random
+import logging
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+
+# Идентификатор текущей задачи; копируется в пул потоков вместе с контекстом
+job_id_var = contextvars.ContextVar("job_id", default=None)
+
+# Стандартные атрибуты LogRecord - всё остальное считается полями из extra
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "job_id", "color_message"}
+
+# Логгеры сервера, которые перенастраиваются на общую очередь
+UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись: время, уровень, сообщение, job_id и поля из extra"""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        job_id = getattr(record, "job_id", None)
+        if job_id:
+            entry["job_id"] = job_id
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class ContextFilter(logging.Filter):
+    """Добавляет job_id и отбрасывает часть записей ниже WARNING.
+
+    Решение о сэмплировании принимается один раз на задачу, поэтому
+    попавшая в выборку задача видна в логах целиком.
+    """
+
+    def __init__(self, sample_rate: float = 1.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record):
+        job_id = job_id_var.get()
+        record.job_id = job_id
+        if record.levelno >= logging.WARNING or self.sample_rate >= 1.0:
+            return True
+        if job_id is None:
+            return random.random() < self.sample_rate
+        return zlib.crc32(job_id.encode()) % 10000 < self.sample_rate * 10000
+
+
+class _PreparedQueueHandler(QueueHandler):
+    """Кладёт в очередь запись с готовым сообщением, но без форматирования.
+
+    Стандартный QueueHandler вклеивает traceback в текст сообщения,
+    что ломает JSON; здесь traceback переносится в exc_text.
+    """
+
+    def prepare(self, record):
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(level: str = "INFO", fmt: str = "json", sample_rate: float = 1.0):
+    """Настраивает корневой логгер: запись в stderr выполняет отдельный поток"""
+    stream_handler = logging.StreamHandler()
+    if fmt == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - [%(job_id)s] %(message)s'))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _PreparedQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter(sample_rate))
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(level.upper())
+
+    # uvicorn ставит свои синхронные текстовые обработчики до импорта приложения;
+    # его записи (в том числе журнал доступа) тоже идут через очередь в общем формате
+    for name in UVICORN_LOGGERS:
+        server_logger = logging.getLogger(name)
+        server_logger.handlers.clear()
+        server_logger.setLevel(logging.NOTSET)
+        server_logger.propagate = True
+
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+@contextmanager
+def log_stage(logger, stage: str, **fields):
+    """Замеряет этап и пишет одну запись с полями stage и duration_ms.
+
+    В выданный словарь можно добавить поля, известные только после этапа.
+    """
+    started = time.perf_counter()
+    yield fields
+    fields["stage"] = stage
+    fields["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    logger.info("Этап завершён", extra=fields)
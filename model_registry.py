@@ -0,0 +1,125 @@
+"""
+Реестр моделей Whisper: ленивая загрузка, маршрутизация по языку
+и дешёвое автоопределение языка с кэшем результатов
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+# Значение параметра language, включающее автоопределение
+AUTO_LANGUAGE = "auto"
+
+# Длительность фрагмента для определения языка (одно окно Whisper)
+DETECT_SECONDS = 30
+SAMPLE_RATE = 16000
+
+# Коды языков Whisper large-v3 на случай, когда faster-whisper не установлен (бэкенд stub)
+WHISPER_LANGUAGES = (
+    "en zh de es ru ko fr ja pt tr pl ca nl ar sv it id hi fi vi he uk el ms cs ro da hu ta no "
+    "th ur hr bg lt la mi ml cy sk te fa lv bn sr az sl kn et mk br eu is hy ne mn bs kk sq sw "
+    "gl mr pa si km sn yo so af oc ka be tg sd gu am yi lo uz fo ht ps tk nn mt sa lb my bo tl "
+    "mg as tt haw ln ha ba jw su yue"
+).split()
+
+
+@lru_cache(maxsize=1)
+def supported_languages() -> frozenset:
+    """Коды языков, которые принимает faster-whisper"""
+    try:
+        from faster_whisper.tokenizer import _LANGUAGE_CODES
+    except ImportError:
+        return frozenset(WHISPER_LANGUAGES)
+    return frozenset(_LANGUAGE_CODES)
+
+
+def is_valid_language(language: str) -> bool:
+    """Проверяет, что язык поддерживается моделью или равен auto"""
+    return language == AUTO_LANGUAGE or language in supported_languages()
+
+
+def parse_language_models(spec: str) -> dict:
+    """Разбирает 'en=distil-large-v2,de=medium' в словарь язык -> модель"""
+    mapping = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        language, _, model_name = item.partition("=")
+        if not model_name:
+            raise ValueError(f"Invalid LANGUAGE_MODELS entry: {item!r}")
+        mapping[language.strip()] = model_name.strip()
+    return mapping
+
+
+class ModelRegistry:
+    """Загружает модели бэкенда по требованию и выбирает модель для языка"""
+
+    def __init__(self, default_model: str, backend, language_models=None):
+        self.default_model = default_model
+        self.backend = backend
+        self.language_models = language_models or {}
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_name: str):
+        """Возвращает модель, загружая её при первом обращении"""
+        model = self._models.get(model_name)
+        if model is not None:
+            return model
+        with self._lock:
+            if model_name not in self._models:
+                self._models[model_name] = self.backend.load(model_name)
+            return self._models[model_name]
+
+    def model_name_for(self, language) -> str:
+        return self.language_models.get(language, self.default_model)
+
+    def for_language(self, language):
+        """Возвращает (имя модели, модель) для языка"""
+        model_name = self.model_name_for(language)
+        return model_name, self.get(model_name)
+
+
+class LanguageDetector:
+    """Определяет язык по первым 30 с аудио и кэширует результат по отпечатку"""
+
+    def __init__(self, registry: ModelRegistry, model_name: str, cache_size: int = 256):
+        self.registry = registry
+        self.model_name = model_name
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def needed(self, forced_model=None, probe=False) -> bool:
+        """Нужен ли отдельный проход определения языка.
+
+        Нужен, если от языка зависит выбор модели (маршрутизация по
+        LANGUAGE_MODELS без принудительной модели и вне проверки готовности)
+        или если для определения задана другая модель, чем та, что будет
+        транскрибировать. Иначе язык определит сама модель транскрибации
+        по тому же выходу энкодера, без второго прохода.
+        """
+        routed = bool(self.registry.language_models) and not forced_model and not probe
+        separate = self.model_name not in (self.registry.default_model, forced_model)
+        return routed or separate
+
+    def detect(self, audio):
+        """Возвращает (язык, вероятность, взят ли результат из кэша)"""
+        head = audio[:DETECT_SECONDS * SAMPLE_RATE]
+        key = hashlib.sha256(head.tobytes()).digest()
+
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                language, probability = self._cache[key]
+                return language, probability, True
+
+        # Генератор сегментов не итерируется: выполняется только энкодер
+        # на одном окне и определение языка, без декодирования
+        _, info = self.registry.get(self.model_name).transcribe(head, language=None)
+        result = (info.language, info.language_probability)
+
+        with self._lock:
+            self._cache[key] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result[0], result[1], False
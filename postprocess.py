@@ -0,0 +1,173 @@
+"""
+Постобработка транскрипта: удаление зацикленных повторов Whisper,
+склейка сегментов в абзацы по паузам и чистка пунктуации.
+Все этапы линейны по длине текста.
+"""
+
+import re
+import time
+from typing import List, NamedTuple
+
+STAGES = ("repeats", "paragraphs", "punctuation")
+
+# Модуль и основание полиномиального хэша
+_HASH_MOD = (1 << 61) - 1
+_HASH_BASE = 1_000_003
+
+_STRIP = ".,!?;:…\"'«»()[]—-"
+_SENTENCE_END = (".", "!", "?", "…")
+
+_SPACES_RE = re.compile(r"[ \t]+")
+_SPACE_BEFORE_PUNCT_RE = re.compile(r" +([,.!?;:…])")
+_REPEATED_PUNCT_RE = re.compile(r"([,;:!?])\1+")
+_MISSING_SPACE_RE = re.compile(r"([,;:!?])(?=[^\W\d_])")
+_LONG_DOTS_RE = re.compile(r"\.{4,}")
+
+
+class Segment(NamedTuple):
+    start: float
+    end: float
+    text: str
+
+
+def remove_repeats(segments: List[Segment], max_repeats: int = 2, max_phrase_words: int = 20):
+    """Удаляет фразы, повторённые подряд больше max_repeats раз, оставляя одну копию.
+
+    Слова сравниваются без регистра и пунктуации, окна сравниваются за O(1)
+    через префиксные полиномиальные хэши, поэтому проход занимает
+    O(N * max_phrase_words). Повторы ищутся и через границы сегментов.
+    Возвращает (сегменты, число удалённых слов).
+    """
+    tokens, owners, ids = [], [], []
+    vocabulary = {}
+    for index, segment in enumerate(segments):
+        for token in segment.text.split():
+            tokens.append(token)
+            owners.append(index)
+            ids.append(vocabulary.setdefault(token.lower().strip(_STRIP), len(vocabulary) + 1))
+
+    n = len(ids)
+    prefix = [0] * (n + 1)
+    powers = [1] * (n + 1)
+    for i, value in enumerate(ids):
+        prefix[i + 1] = (prefix[i] * _HASH_BASE + value) % _HASH_MOD
+        powers[i + 1] = powers[i] * _HASH_BASE % _HASH_MOD
+
+    def window(i, length):
+        return (prefix[i + length] - prefix[i] * powers[length]) % _HASH_MOD
+
+    keep = [True] * n
+    removed = 0
+    i = 0
+    while i < n:
+        advanced = False
+        for period in range(1, max_phrase_words + 1):
+            if i + 2 * period > n:
+                break
+            # Дешёвый отсев по первому слову до сравнения хэшей окон
+            if ids[i] != ids[i + period]:
+                continue
+            copies, j = 1, i
+            while j + 2 * period <= n and window(j, period) == window(j + period, period) \
+                    and ids[j:j + period] == ids[j + period:j + 2 * period]:
+                copies += 1
+                j += period
+            if copies > max_repeats:
+                for k in range(i + period, i + copies * period):
+                    keep[k] = False
+                removed += (copies - 1) * period
+                i += copies * period
+                advanced = True
+                break
+        if not advanced:
+            i += 1
+
+    if removed == 0:
+        return segments, 0
+
+    texts = [[] for _ in segments]
+    for token, owner, kept in zip(tokens, owners, keep):
+        if kept:
+            texts[owner].append(token)
+    result = [
+        Segment(segment.start, segment.end, " ".join(words))
+        for segment, words in zip(segments, texts) if words
+    ]
+    return result, removed
+
+
+def merge_paragraphs(segments: List[Segment], pause: float = 2.0) -> List[str]:
+    """Склеивает сегменты в абзацы; новый абзац начинается после паузы >= pause секунд
+    на границе предложения
+    """
+    paragraphs, current = [], []
+    previous = None
+    for segment in segments:
+        text = segment.text.strip()
+        if not text:
+            continue
+        if previous is not None and segment.start - previous.end >= pause \
+                and current[-1].endswith(_SENTENCE_END):
+            paragraphs.append(" ".join(current))
+            current = []
+        current.append(text)
+        previous = segment
+    if current:
+        paragraphs.append(" ".join(current))
+    return paragraphs
+
+
+def clean_punctuation(text: str) -> str:
+    """Нормализует пробелы и знаки препинания регулярными выражениями за один проход каждое"""
+    text = _SPACES_RE.sub(" ", text)
+    text = _LONG_DOTS_RE.sub("...", text)
+    text = _REPEATED_PUNCT_RE.sub(r"\1", text)
+    text = _SPACE_BEFORE_PUNCT_RE.sub(r"\1", text)
+    text = _MISSING_SPACE_RE.sub(r"\1 ", text)
+    lines = [line.strip() for line in text.split("\n")]
+    return "\n".join(line[:1].upper() + line[1:] for line in lines)
+
+
+class TranscriptPostprocessor:
+    """Настраиваемый набор этапов; пустой набор даёт прежний вывод - сегменты построчно"""
+
+    def __init__(self, stages=STAGES, paragraph_pause: float = 2.0, max_repeats: int = 2,
+                 max_phrase_words: int = 20):
+        unknown = set(stages) - set(STAGES)
+        if unknown:
+            raise ValueError(f"Unknown postprocessing stages: {', '.join(sorted(unknown))}")
+        self.stages = tuple(stages)
+        self.paragraph_pause = paragraph_pause
+        self.max_repeats = max_repeats
+        self.max_phrase_words = max_phrase_words
+
+    def run(self, segments: List[Segment]):
+        """Возвращает (текст, статистика с длительностью каждого этапа в мс)"""
+        stats = {}
+
+        started = time.perf_counter()
+        if "repeats" in self.stages:
+            segments, stats["removed_words"] = remove_repeats(
+                segments, self.max_repeats, self.max_phrase_words
+            )
+            stats["repeats_ms"] = _elapsed_ms(started)
+
+        started = time.perf_counter()
+        if "paragraphs" in self.stages:
+            paragraphs = merge_paragraphs(segments, self.paragraph_pause)
+            text = "\n\n".join(paragraphs)
+            stats["paragraphs"] = len(paragraphs)
+            stats["paragraphs_ms"] = _elapsed_ms(started)
+        else:
+            text = "\n".join(segment.text for segment in segments)
+
+        started = time.perf_counter()
+        if "punctuation" in self.stages:
+            text = clean_punctuation(text)
+            stats["punctuation_ms"] = _elapsed_ms(started)
+
+        return text, stats
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
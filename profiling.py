@@ -0,0 +1,186 @@
+"""
+Профилирование отдельных запросов: cProfile и выборка стеков для каждого
+этапа в пуле потоков, итог сохраняется в каталог задачи
+"""
+
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import secrets
+import functools
+import threading
+import contextvars
+from collections import Counter
+
+# Профиль текущей задачи; None - профилирование выключено
+profile_var = contextvars.ContextVar("profile", default=None)
+
+# Интервал выборки стеков по умолчанию
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+
+class StackSampler(threading.Thread):
+    """Периодически снимает стек одного потока, как py-spy, но изнутри процесса.
+
+    Время внутри C-расширений (CTranslate2, NumPy) приписывается вызвавшему
+    их Python-кадру, поэтому видно, какой вызов держит поток.
+    """
+
+    def __init__(self, thread_id: int, interval: float, counter: Counter):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counter = counter
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.counter[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class JobProfile:
+    """Собирает профиль одной задачи по этапам"""
+
+    def __init__(self, job_id: str, directory: str, interval: float = DEFAULT_SAMPLE_INTERVAL):
+        self.job_id = job_id
+        self.directory = directory
+        self.interval = interval
+        self.stages = []
+        self.samples = Counter()
+        self._profiles = []
+        self._started = time.perf_counter()
+
+    def wrap(self, func):
+        """Оборачивает функцию пула так, чтобы её вызов стал этапом профиля"""
+        def profiled(*args, **kwargs):
+            return self.run_stage(func.__qualname__, func, *args, **kwargs)
+        return profiled
+
+    def run_stage(self, name: str, func, *args, **kwargs):
+        sampler = StackSampler(threading.get_ident(), self.interval, self.samples)
+        profiler = cProfile.Profile()
+        gpu_before = _gpu_memory_used()
+        wall, cpu = time.perf_counter(), time.thread_time()
+        sampler.start()
+        profiler.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
+            sampler.stop()
+            # Разница wall и cpu - ожидание GPU (CTranslate2), ввода-вывода или блокировок
+            stage = {
+                "stage": name,
+                "wall_ms": round((time.perf_counter() - wall) * 1000, 1),
+                "cpu_ms": round((time.thread_time() - cpu) * 1000, 1),
+            }
+            if gpu_before is not None:
+                stage.update(gpu_memory_before_mb=gpu_before, gpu_memory_after_mb=_gpu_memory_used())
+            self.stages.append(stage)
+            self._profiles.append((name, profiler))
+
+    def save(self) -> str:
+        """Пишет summary.json, stacks.folded и .pstats по этапам; возвращает каталог"""
+        path = os.path.join(self.directory, self.job_id)
+        os.makedirs(path, exist_ok=True)
+
+        for index, (name, profiler) in enumerate(self._profiles):
+            pstats.Stats(profiler).dump_stats(os.path.join(path, f"{index:02d}_{name}.pstats"))
+
+        # Формат folded подходит для flamegraph.pl и speedscope
+        with open(os.path.join(path, "stacks.folded"), "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+        summary = {
+            "job_id": self.job_id,
+            "total_ms": round((time.perf_counter() - self._started) * 1000, 1),
+            "stages": self.stages,
+            "sample_interval_ms": self.interval * 1000,
+            "samples": sum(self.samples.values()),
+            "gpu_device": _gpu_device(),
+        }
+        with open(os.path.join(path, "summary.json"), "w") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        return path
+
+
+@functools.lru_cache(maxsize=1)
+def _nvml_handle():
+    """Дескриптор GPU 0 в NVML; None без драйвера NVIDIA или пакета nvidia-ml-py"""
+    try:
+        import pynvml
+        pynvml.nvmlInit()
+        return pynvml.nvmlDeviceGetHandleByIndex(0)
+    except Exception:
+        return None
+
+
+def _gpu_memory_used():
+    """Занятая память GPU в МБ по данным драйвера.
+
+    В отличие от счётчиков torch, учитывает память CTranslate2, но это
+    значение по всему устройству, включая другие процессы.
+    """
+    handle = _nvml_handle()
+    if handle is None:
+        return None
+    import pynvml
+    return round(pynvml.nvmlDeviceGetMemoryInfo(handle).used / 2**20, 1)
+
+
+def _gpu_device():
+    handle = _nvml_handle()
+    if handle is None:
+        return None
+    import pynvml
+    name = pynvml.nvmlDeviceGetName(handle)
+    return name.decode() if isinstance(name, bytes) else name
+
+
+class ProfileSwitch:
+    """Решает, профилировать ли запрос: по токену администратора, в окне времени
+    или всегда (always, задаётся только через окружение)
+    """
+
+    def __init__(self, token, directory: str, interval: float = DEFAULT_SAMPLE_INTERVAL, always: bool = False):
+        self.token = token
+        self.directory = directory
+        self.interval = interval
+        self.always = always
+        self._window_until = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token) or self.always
+
+    def check_token(self, token) -> bool:
+        return bool(self.token) and token is not None and secrets.compare_digest(token, self.token)
+
+    def open_window(self, seconds: float) -> float:
+        """Профилирует все запросы в ближайшие seconds секунд"""
+        self._window_until = time.monotonic() + seconds
+        return self._window_until
+
+    def start(self, job_id: str, token=None):
+        """Возвращает JobProfile для запроса или None"""
+        if not self.enabled:
+            return None
+        if not (self.always or self.check_token(token) or time.monotonic() < self._window_until):
+            return None
+        return JobProfile(job_id, self.directory, self.interval)
@@ -0,0 +1,96 @@
+"""
+Проверка готовности: короткий синтетический клип по расписанию проходит
+через настоящий конвейер, замеряются задержка и real-time factor
+"""
+
+import time
+import asyncio
+import logging
+import numpy as np
+from crypto_utils import encrypt_data, decrypt_data
+from audio_utils import TARGET_SAMPLE_RATE, pcm16_wav_header, to_pcm16
+
+logger = logging.getLogger(__name__)
+
+
+def synthetic_clip(seconds: float = 5.0, sample_rate: int = TARGET_SAMPLE_RATE) -> bytes:
+    """Речеподобный сигнал: гармоники с плавающей основной частотой и слоговой огибающей"""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    pitch = 140 + 40 * np.sin(2 * np.pi * 0.5 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    voice = sum(np.sin(k * phase) / k for k in range(1, 8))
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t) ** 2
+    signal = (0.2 * voice * envelope).astype(np.float32)
+    return pcm16_wav_header(len(signal), sample_rate) + to_pcm16(signal)
+
+
+class ReadinessProbe:
+    """Периодически прогоняет зашифрованный клип через конвейер и хранит последний результат.
+
+    pipeline - корутина, принимающая зашифрованное аудио и возвращающая
+    зашифрованный текст, как обычный запрос. key_provider возвращает
+    KeyContext и вызывается перед каждым прогоном, чтобы ротация ключей
+    без перезапуска не ломала проверку.
+    """
+
+    def __init__(self, pipeline, key_provider, clip_seconds: float = 5.0, interval: float = 60.0,
+                 max_latency: float = 10.0, max_rtf: float = 1.0):
+        self.pipeline = pipeline
+        self.key_provider = key_provider
+        self.clip_seconds = clip_seconds
+        self.interval = interval
+        self.max_latency = max_latency
+        self.max_rtf = max_rtf
+        self._clip = synthetic_clip(clip_seconds)
+        # Шифротекст клипа переиспользуется, пока ключ не сменился
+        self._encrypted = (None, None)
+        self.last = None
+
+    def _encrypted_clip(self, key) -> bytes:
+        if self._encrypted[0] != key:
+            # Клип шифруется как у клиента: ключом, которым сервер расшифровывает запросы
+            self._encrypted = (key, encrypt_data(self._clip, key.decrypt_key, key.key_id))
+        return self._encrypted[1]
+
+    async def run_once(self) -> dict:
+        started = time.perf_counter()
+        try:
+            key = self.key_provider()
+            encrypted_result = await self.pipeline(self._encrypted_clip(key))
+            # Ответ должен расшифровываться, иначе конвейер сломан
+            decrypt_data(encrypted_result, key.encrypt_key).decode("utf-8")
+            latency = time.perf_counter() - started
+            rtf = latency / self.clip_seconds
+            result = {
+                "ready": latency <= self.max_latency and rtf <= self.max_rtf,
+                "latency_seconds": round(latency, 3),
+                "rtf": round(rtf, 3),
+            }
+        except Exception as e:
+            result = {"ready": False, "error": str(e)}
+
+        result.update(
+            checked_at=time.time(),
+            max_latency_seconds=self.max_latency,
+            max_rtf=self.max_rtf,
+        )
+        self.last = result
+        if result["ready"]:
+            logger.info("Проверка готовности пройдена", extra=result)
+        else:
+            logger.warning("Проверка готовности не пройдена", extra=result)
+        return result
+
+    async def run_forever(self):
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    def status(self):
+        """Возвращает (готов ли сервис, последний результат)"""
+        if self.last is None:
+            return False, {"ready": False, "error": "probe has not run yet"}
+        # Зависший прогон не должен оставлять старый успешный результат
+        if time.time() - self.last["checked_at"] > 3 * self.interval + self.max_latency:
+            return False, dict(self.last, ready=False, error="probe result is stale")
+        return self.last["ready"], self.last
@@ -17,6 +17,7 @@ CONTAINER_NAME="stenogramma"
 IMAGE_NAME=""  # Будет определен автоматически
 PORT="8000"
 ENV_FILE=".env"
+SHM_SIZE="${SHM_SIZE:-2g}"  # tmpfs для временных файлов с аудио
 
 print_info() {
     echo -e "${BLUE}ℹ️  $1${NC}"
@@ -230,6 +231,7 @@ start_container() {
     DOCKER_CMD="$DOCKER_CMD --restart unless-stopped"
     DOCKER_CMD="$DOCKER_CMD -p $PORT:8000"
     DOCKER_CMD="$DOCKER_CMD --env-file $ENV_FILE"
+    DOCKER_CMD="$DOCKER_CMD --shm-size $SHM_SIZE"
     
     # Добавление GPU поддержки только если это GPU образ и GPU доступен
     if [ "$USE_GPU" = true ] && [[ "$IMAGE_NAME" == *"stenogramma:latest"* ]]; then
@@ -0,0 +1,184 @@
+"""
+Временные файлы с аудио: по возможности в tmpfs (/dev/shm), без имени
+в файловой системе, с откатом на диск при нехватке памяти и уборкой
+осиротевших файлов после падения
+"""
+
+import os
+import time
+import tempfile
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Префикс именованных временных файлов (когда O_TMPFILE недоступен)
+SPOOL_PREFIX = "spool-"
+# Файлы старых версий, которые тоже подлежат уборке
+LEGACY_PREFIXES = ("temp_audio_",)
+# Запас свободного места в tmpfs после записи файла
+TMPFS_HEADROOM = 16 << 20
+
+
+def memory_available() -> Optional[int]:
+    """Доступная память в байтах: меньшее из остатка до лимита cgroup и MemAvailable.
+
+    В контейнере /proc/meminfo показывает память хоста, а страницы tmpfs
+    учитываются в cgroup контейнера, поэтому лимит cgroup важнее.
+    None, если узнать нельзя.
+    """
+    values = [value for value in (_cgroup_available(), _meminfo_available()) if value is not None]
+    return min(values) if values else None
+
+
+def _meminfo_available() -> Optional[int]:
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _cgroup_dir() -> Optional[str]:
+    """Каталог cgroup v2 текущего процесса или None без cgroup v2"""
+    try:
+        with open("/proc/self/cgroup") as f:
+            path = next((line.strip()[3:] for line in f if line.startswith("0::")), None)
+        with open("/proc/mounts") as f:
+            root = next((line.split()[1] for line in f if line.split()[2:3] == ["cgroup2"]), None)
+    except OSError:
+        return None
+    if path is None or root is None:
+        return None
+    return os.path.join(root, path.lstrip("/"))
+
+
+def _cgroup_available(directory: Optional[str] = None) -> Optional[int]:
+    """memory.max - memory.current плюс вытесняемый кэш (inactive_file); None без лимита"""
+    directory = directory or _cgroup_dir()
+    if directory is None:
+        return None
+    try:
+        with open(os.path.join(directory, "memory.max")) as f:
+            limit = f.read().strip()
+        if limit == "max":
+            return None
+        with open(os.path.join(directory, "memory.current")) as f:
+            current = int(f.read())
+        reclaimable = 0
+        with open(os.path.join(directory, "memory.stat")) as f:
+            for line in f:
+                if line.startswith("inactive_file "):
+                    reclaimable = int(line.split()[1])
+                    break
+    except (OSError, ValueError):
+        return None
+    return max(0, int(limit) - current + reclaimable)
+
+
+def is_tmpfs(path: str) -> bool:
+    """Проверяет по /proc/mounts, что каталог лежит в tmpfs"""
+    try:
+        with open("/proc/mounts") as f:
+            mounts = [line.split()[1:3] for line in f]
+    except OSError:
+        return False
+    path = os.path.realpath(path)
+    best, best_type = "", None
+    for mount_point, fs_type in mounts:
+        if (path == mount_point or path.startswith(mount_point.rstrip("/") + "/")) and len(mount_point) > len(best):
+            best, best_type = mount_point, fs_type
+    return best_type in ("tmpfs", "ramfs")
+
+
+def _usable_dir(path: str) -> bool:
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        return os.access(path, os.W_OK)
+    except OSError:
+        return False
+
+
+class Spool:
+    """Выбирает каталог под каждый файл: память, пока её хватает, иначе диск.
+
+    Файл в памяти выбирается, только если он помещается в tmpfs с запасом
+    и после записи MemAvailable останется не меньше min_free байт.
+    """
+
+    def __init__(self, memory_dir: str = "/dev/shm/stenogramma", disk_dir: str = "temp",
+                 min_free: int = 1 << 30):
+        self.disk_dir = disk_dir
+        self.min_free = min_free
+        self.memory_dir = memory_dir if memory_dir and is_tmpfs(memory_dir) and _usable_dir(memory_dir) else None
+        os.makedirs(disk_dir, mode=0o700, exist_ok=True)
+
+    @property
+    def directories(self):
+        return [d for d in (self.memory_dir, self.disk_dir) if d]
+
+    def choose(self, size: int):
+        """Возвращает (каталог, "memory" или "disk") для файла размером size"""
+        if self.memory_dir:
+            stat = os.statvfs(self.memory_dir)
+            free_tmpfs = stat.f_bavail * stat.f_frsize
+            available = memory_available()
+            if free_tmpfs - size >= TMPFS_HEADROOM and (available is None or available - size >= self.min_free):
+                return self.memory_dir, "memory"
+        return self.disk_dir, "disk"
+
+    def write(self, data: bytes):
+        """Пишет данные в безымянный файл и возвращает (открытый файл в начале, вид хранилища).
+
+        Файл исчезает при закрытии или завершении процесса, даже аварийном.
+        """
+        directory, kind = self.choose(len(data))
+        f = _open_anonymous(directory)
+        try:
+            f.write(data)
+            f.flush()
+            f.seek(0)
+        except Exception:
+            f.close()
+            raise
+        return f, kind
+
+    def reclaim_orphans(self, min_age: float = 60.0) -> int:
+        """Удаляет именованные временные файлы, оставшиеся после падений"""
+        removed = 0
+        now = time.time()
+        for directory in self.directories:
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                if not entry.name.startswith((SPOOL_PREFIX,) + LEGACY_PREFIXES):
+                    continue
+                try:
+                    if entry.is_file(follow_symlinks=False) and now - entry.stat().st_mtime >= min_age:
+                        os.remove(entry.path)
+                        removed += 1
+                except OSError:
+                    continue
+        if removed:
+            logger.warning("Удалены осиротевшие временные файлы", extra={"files": removed})
+        return removed
+
+
+def _open_anonymous(directory: str):
+    """O_TMPFILE, где поддерживается, иначе mkstemp с немедленным unlink"""
+    flag = getattr(os, "O_TMPFILE", None)
+    if flag is not None:
+        try:
+            fd = os.open(directory, flag | os.O_RDWR, 0o600)
+            return os.fdopen(fd, "w+b")
+        except OSError:
+            # Файловая система (например, overlayfs) может не поддерживать O_TMPFILE
+            pass
+    fd, path = tempfile.mkstemp(prefix=SPOOL_PREFIX, dir=directory)
+    os.unlink(path)
+    return os.fdopen(fd, "w+b")
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Автономный тест предобработки аудио
+"""
+
+import io
+import os
+import wave
+import tempfile
+import numpy as np
+from audio_utils import (
+    preprocess_wav, parse_wav_header, resample_poly, trim_silence, decode_samples, downmix,
+    StreamingResampler, stream_wav_to_pcm16,
+    AudioFormatError, UnsupportedAudioFormat, TARGET_SAMPLE_RATE
+)
+
+def make_wav(samples, sample_rate, sample_width=2):
+    """Собирает WAV из массива float формы (кадры, каналы)"""
+    scale = 2 ** (8 * sample_width - 1) - 1
+    pcm = (samples * scale).astype(f"<i{sample_width}")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(samples.shape[1])
+        w.setsampwidth(sample_width)
+        w.setframerate(sample_rate)
+        w.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+def test_stereo_48k():
+    """Стерео 48 кГц превращается в моно 16 кГц"""
+    print("🎚️  Тестирование даунмикса и ресемплинга...")
+
+    sample_rate = 48000
+    t = np.arange(sample_rate * 2) / sample_rate
+    tone = 0.5 * np.sin(2 * np.pi * 440 * t)
+    stereo = np.stack([tone, tone], axis=1)
+
+    try:
+        audio, stats = preprocess_wav(make_wav(stereo, sample_rate))
+
+        if audio.ndim == 1 and audio.dtype == np.float32 and stats.source_channels == 2 \
+                and abs(len(audio) - 2 * TARGET_SAMPLE_RATE) <= 1:
+            print(f"✅ Тест пройден: {stats.input_seconds:.1f} с -> {len(audio)} отсчётов")
+            return True
+        else:
+            print(f"❌ Тест провален: форма {audio.shape}, тип {audio.dtype}")
+            return False
+
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def test_resample_preserves_tone():
+    """Тон ниже частоты Найквиста сохраняет амплитуду после ресемплинга"""
+    print("\n🎵 Тестирование сохранения сигнала при ресемплинге...")
+
+    sample_rate = 44100
+    t = np.arange(sample_rate) / sample_rate
+    tone = (0.5 * np.sin(2 * np.pi * 1000 * t)).astype(np.float32)
+
+    try:
+        resampled = resample_poly(tone, sample_rate)
+        # Середина сигнала без краевых эффектов фильтра
+        middle = resampled[len(resampled) // 4: 3 * len(resampled) // 4]
+        rms = float(np.sqrt(np.mean(middle ** 2)))
+
+        if abs(rms - 0.5 / np.sqrt(2)) < 0.01:
+            print(f"✅ Тест пройден: RMS {rms:.4f}")
+            return True
+        else:
+            print(f"❌ Тест провален: RMS {rms:.4f}")
+            return False
+
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def test_trim_silence():
+    """Тишина по краям удаляется, речь остаётся"""
+    print("\n🔇 Тестирование обрезки тишины...")
+
+    sample_rate = TARGET_SAMPLE_RATE
+    signal = np.zeros(sample_rate * 5, dtype=np.float32)
+    signal[2 * sample_rate:3 * sample_rate] = 0.3
+
+    try:
+        trimmed, lead, trail = trim_silence(signal, sample_rate, pad_ms=0)
+
+        if abs(lead - 2 * sample_rate) < sample_rate // 10 and abs(trail - 2 * sample_rate) < sample_rate // 10 \
+                and np.all(trimmed[sample_rate // 10:-sample_rate // 10] == 0.3):
+            print(f"✅ Тест пройден: удалено {lead / sample_rate:.2f} с + {trail / sample_rate:.2f} с")
+            return True
+        else:
+            print(f"❌ Тест провален: удалено {lead} + {trail} отсчётов")
+            return False
+
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def test_invalid_header():
+    """Не-WAV данные и неподдерживаемые кодеки различаются"""
+    print("\n🚫 Тестирование проверки заголовка...")
+
+    # Корректный RIFF с кодеком A-law (0x0006)
+    alaw = bytearray(make_wav(np.zeros((100, 1)), 8000))
+    alaw[20:22] = (6).to_bytes(2, "little")
+
+    try:
+        try:
+            parse_wav_header(b"not a wav file at all")
+            print("❌ Тест провален: мусор принят как WAV")
+            return False
+        except UnsupportedAudioFormat:
+            print("❌ Тест провален: мусор принят за неподдерживаемый кодек")
+            return False
+        except AudioFormatError:
+            pass
+
+        try:
+            parse_wav_header(bytes(alaw))
+            print("❌ Тест провален: A-law принят")
+            return False
+        except UnsupportedAudioFormat:
+            print("✅ Тест пройден: некорректные файлы отклонены")
+            return True
+
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def test_blockwise_preprocess():
+    """Обработка блоками совпадает с обработкой всего массива"""
+    print("\n🧱 Тестирование предобработки блоками...")
+
+    rng = np.random.default_rng(0)
+
+    try:
+        for sample_rate, channels, chunk_frames in ((48000, 2, 777), (44100, 2, 1000), (8000, 1, 333), (16000, 2, 4096)):
+            signal = np.clip(0.3 * rng.standard_normal((sample_rate + 123, channels)), -1, 1)
+            data = make_wav(signal, sample_rate)
+
+            # Прежняя обработка: весь блок данных сразу
+            info = parse_wav_header(data)
+            whole = resample_poly(downmix(decode_samples(data, info)), sample_rate, TARGET_SAMPLE_RATE)
+            expected, _, _ = trim_silence(whole, TARGET_SAMPLE_RATE, -50.0)
+
+            audio, _ = preprocess_wav(data, chunk_frames=chunk_frames)
+            if audio.shape != expected.shape or np.max(np.abs(audio - expected)) > 1e-5:
+                print(f"❌ Тест провален: {sample_rate} Гц, блок {chunk_frames}, {audio.shape} != {expected.shape}")
+                return False
+
+        print("✅ Тест пройден: 48/44.1/8/16 кГц совпадают")
+        return True
+
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def test_streaming_resampler():
+    """Ресемплинг по блокам любой длины совпадает с ресемплингом целиком"""
+    print("\n🌊 Тестирование потокового ресемплера...")
+
+    rng = np.random.default_rng(1)
+
+    try:
+        for sample_rate in (44100, 48000, 8000):
+            signal = rng.standard_normal(sample_rate * 2 + 17).astype(np.float32)
+            expected = resample_poly(signal, sample_rate, TARGET_SAMPLE_RATE)
+            for chunk in (1, 777, 1000, 4097):
+                resampler = StreamingResampler(sample_rate, TARGET_SAMPLE_RATE)
+                parts = [resampler.process(signal[i:i + chunk]) for i in range(0, len(signal), chunk)]
+                result = np.concatenate(parts + [resampler.flush()])
+                if result.shape != expected.shape or np.max(np.abs(result - expected)) > 1e-5:
+                    print(f"❌ Тест провален: {sample_rate} Гц, блок {chunk}")
+                    return False
+
+        print("✅ Тест пройден: 44.1/48/8 кГц, блоки 1-4097 отсчётов")
+        return True
+
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def test_stream_header_size():
+    """Размер данных в заголовке потока равен числу отданных байт, в том числе для обрезанного файла"""
+    print("\n📏 Тестирование заголовка потокового WAV...")
+
+    rng = np.random.default_rng(2)
+    directory = tempfile.mkdtemp()
+
+    try:
+        for sample_rate, cut in ((44100, 0), (48000, 0), (8000, 0), (48000, 1001)):
+            data = make_wav(np.clip(0.3 * rng.standard_normal((sample_rate + 555, 2)), -1, 1), sample_rate)
+            path = os.path.join(directory, f"{sample_rate}_{cut}.wav")
+            with open(path, "wb") as f:
+                # Обрезанный файл: заголовок обещает больше данных, чем записано
+                f.write(data[:len(data) - cut])
+
+            parts = list(stream_wav_to_pcm16(path, chunk_frames=777))
+            header = parse_wav_header(parts[0] + b"".join(parts[1:]))
+            emitted = sum(len(part) for part in parts[1:])
+            if header.data_size != emitted or header.sample_rate != TARGET_SAMPLE_RATE or header.channels != 1:
+                print(f"❌ Тест провален: {sample_rate} Гц, обрезано {cut}: {header.data_size} != {emitted}")
+                return False
+
+        print("✅ Тест пройден")
+        return True
+
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def main():
+    print("🧪 Автономный тест предобработки аудио")
+    print("=" * 50)
+
+    tests = [
+        test_stereo_48k,
+        test_resample_preserves_tone,
+        test_trim_silence,
+        test_invalid_header,
+        test_blockwise_preprocess,
+        test_streaming_resampler,
+        test_stream_header_size
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test in tests:
+        if test():
+            passed += 1
+
+    print("\n" + "=" * 50)
+    print(f"📊 Результат: {passed}/{total} тестов пройдено")
+
+    if passed == total:
+        print("🎉 Все тесты пройдены! Предобработка аудио работает корректно.")
+        return True
+    else:
+        print("❌ Некоторые тесты провалены. Проверьте реализацию audio_utils.")
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
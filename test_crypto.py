@@ -3,9 +3,17 @@
 Автономный тест криптографических функций
 """
 
+import gc
 import os
+import json
+import weakref
+import asyncio
+import time
 import secrets
-from crypto_utils import encrypt_data, decrypt_data
+import tempfile
+from crypto_utils import encrypt_data, encrypt_stream, decrypt_data, read_key_id
+from keyring_utils import Keyring, UnknownKeyError
+from readiness import ReadinessProbe
 
 def test_basic_encryption():
     """Базовый тест шифрования/расшифрования"""
@@ -131,6 +139,183 @@ def test_unicode_data():
         print(f"❌ Ошибка теста: {e}")
         return False
 
+def test_key_id_header():
+    """Тест заголовка с идентификатором ключа"""
+    print("\n🏷️  Тестирование заголовка key_id...")
+    
+    test_data = "Данные арендатора".encode('utf-8')
+    test_key = secrets.token_bytes(32)
+    
+    try:
+        tagged = encrypt_data(test_data, test_key, "tenant-a-2026")
+        legacy = encrypt_data(test_data, test_key)
+        
+        key_id, _ = read_key_id(tagged)
+        legacy_id, _ = read_key_id(legacy)
+        
+        if key_id == "tenant-a-2026" and legacy_id is None \
+                and decrypt_data(tagged, test_key) == test_data \
+                and decrypt_data(legacy, test_key) == test_data:
+            print("✅ Тест пройден: оба формата расшифровываются")
+            return True
+        else:
+            print(f"❌ Тест провален: key_id={key_id}, legacy={legacy_id}")
+            return False
+            
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def test_stream_encryption():
+    """Потоковое шифрование частями произвольной длины совместимо с decrypt_data"""
+    print("\n🌊 Тестирование потокового шифрования...")
+    
+    key = secrets.token_bytes(32)
+    data = secrets.token_bytes(100_003)
+    sizes = [0, 1, 15, 16, 17, 4096, 33]
+    
+    try:
+        chunks, position = [], 0
+        while position < len(data):
+            size = sizes[len(chunks) % len(sizes)]
+            chunks.append(data[position:position + size])
+            position += size
+        
+        encrypted = b"".join(encrypt_stream(iter(chunks), key, "k1"))
+        empty = b"".join(encrypt_stream(iter([]), key))
+        
+        if decrypt_data(encrypted, key) == data and read_key_id(encrypted)[0] == "k1" and decrypt_data(empty, key) == b"":
+            print(f"✅ Тест пройден: {len(chunks)} частей, {len(encrypted)} байт")
+            return True
+        else:
+            print("❌ Тест провален: данные не совпадают")
+            return False
+            
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def test_keyring_reload():
+    """Тест выбора ключа по key_id и перечитывания набора ключей"""
+    print("\n🔄 Тестирование набора ключей...")
+    
+    old = {"tenant": "a", "decrypt": secrets.token_hex(32), "encrypt": secrets.token_hex(32)}
+    new = {"tenant": "a", "secret": secrets.token_hex(32)}
+    path = os.path.join(tempfile.mkdtemp(), "keyring.json")
+    
+    try:
+        with open(path, "w") as f:
+            json.dump({"keys": {"a-old": old}}, f)
+        keyring = Keyring(path, reload_interval=0)
+        
+        encrypted = encrypt_data(b"audio", bytes.fromhex(old["decrypt"]), "a-old")
+        context = keyring.resolve(encrypted)
+        if decrypt_data(encrypted, context.decrypt_key) != b"audio":
+            print("❌ Тест провален: ключ выбран неверно")
+            return False
+        
+        # Ротация без перезапуска: добавляем новый ключ, старый отключаем
+        time.sleep(0.01)
+        with open(path, "w") as f:
+            json.dump({"keys": {"a-old": dict(old, active=False), "a-new": new}}, f)
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + 1_000_000))
+        
+        new_context = keyring.get("a-new")
+        try:
+            keyring.get("a-old")
+            print("❌ Тест провален: отключённый ключ всё ещё активен")
+            return False
+        except UnknownKeyError:
+            pass
+        
+        if new_context is keyring.get("a-new") and len(new_context.decrypt_key) == 32:
+            print("✅ Тест пройден: ключи перечитаны без перезапуска")
+            return True
+        else:
+            print("❌ Тест провален: контекст ключа не кэшируется")
+            return False
+            
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def test_keyring_cache():
+    """Неизменные ключи переживают перечитывание, отключённые уходят из памяти"""
+    print("\n🗝️  Тестирование кэша контекстов ключей...")
+    
+    kept = {"tenant": "a", "secret": secrets.token_hex(32)}
+    revoked = {"tenant": "b", "secret": secrets.token_hex(32)}
+    path = os.path.join(tempfile.mkdtemp(), "keyring.json")
+    
+    def write(keys):
+        with open(path, "w") as f:
+            json.dump({"keys": keys}, f)
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + 1_000_000))
+    
+    try:
+        write({"k1": kept, "k2": revoked})
+        keyring = Keyring(path, reload_interval=0)
+        first = keyring.get("k1")
+        revoked_ref = weakref.ref(keyring.get("k2"))
+        
+        # Смена арендатора меняет контекст, хотя секрет тот же
+        time.sleep(0.01)
+        write({"k1": kept, "k2": dict(revoked, active=False), "k3": dict(kept, tenant="c")})
+        reused = keyring.get("k1") is first
+        gc.collect()
+        released = revoked_ref() is None
+        tenant = keyring.get("k3").tenant
+        
+        if reused and released and tenant == "c" and len(keyring._derived) == 2:
+            print("✅ Тест пройден: отключённый ключ освобождён")
+            return True
+        else:
+            print(f"❌ Тест провален: переиспользован {reused}, освобождён {released}, {tenant}")
+            return False
+            
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def test_probe_key_rotation():
+    """Проверка готовности переживает отключение своего ключа"""
+    print("\n🩺 Тестирование ротации ключа проверки готовности...")
+    
+    first = {"tenant": "a", "secret": secrets.token_hex(32)}
+    second = {"tenant": "a", "secret": secrets.token_hex(32)}
+    path = os.path.join(tempfile.mkdtemp(), "keyring.json")
+    
+    try:
+        with open(path, "w") as f:
+            json.dump({"keys": {"k1": first}}, f)
+        keyring = Keyring(path, reload_interval=0)
+        
+        # Конвейер без модели: расшифровка по key_id и шифрование ответа тем же ключом
+        async def pipeline(encrypted_audio):
+            key = keyring.resolve(encrypted_audio)
+            decrypt_data(encrypted_audio, key.decrypt_key)
+            return encrypt_data("текст".encode("utf-8"), key.encrypt_key, key.key_id)
+        
+        probe = ReadinessProbe(pipeline, key_provider=keyring.any_context, clip_seconds=0.5, max_latency=60, max_rtf=100)
+        before = asyncio.run(probe.run_once())
+        
+        time.sleep(0.01)
+        with open(path, "w") as f:
+            json.dump({"keys": {"k1": dict(first, active=False), "k2": second}}, f)
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + 1_000_000))
+        after = asyncio.run(probe.run_once())
+        
+        if before["ready"] and after["ready"]:
+            print("✅ Тест пройден: проверка перешла на новый ключ")
+            return True
+        else:
+            print(f"❌ Тест провален: {before}, {after}")
+            return False
+            
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
 def main():
     print("🧪 Автономный тест криптографических функций")
     print("=" * 50)
@@ -140,7 +325,12 @@ def main():
         test_different_keys,
         test_large_data,
         test_empty_data,
-        test_unicode_data
+        test_unicode_data,
+        test_key_id_header,
+        test_stream_encryption,
+        test_keyring_reload,
+        test_keyring_cache,
+        test_probe_key_rotation
     ]
     
     passed = 0
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Автономный тест адаптивного снижения качества под нагрузкой
+"""
+
+from load_control import LoadController, default_levels
+
+def make_controller(pending, rtf=None, max_level=None):
+    controller = LoadController(default_levels("medium"), queue_threshold=4, rtf_limit=0.5, max_level=max_level)
+    for _ in range(pending):
+        controller.enter()
+    if rtf is not None:
+        controller.observe(100.0, rtf * 100.0)
+    return controller
+
+def test_level_by_queue():
+    """Уровень растёт на единицу за каждые queue_threshold задач в очереди"""
+    print("📶 Тестирование уровня по длине очереди...")
+
+    try:
+        levels = [make_controller(pending).level() for pending in (1, 4, 5, 9, 30)]
+
+        if levels == [0, 0, 1, 2, 2]:
+            print(f"✅ Тест пройден: {levels}")
+            return True
+        else:
+            print(f"❌ Тест провален: {levels}")
+            return False
+
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def test_level_by_rtf():
+    """Медленная обработка добавляет уровень, только если есть очередь"""
+    print("\n🐢 Тестирование уровня по RTF...")
+
+    try:
+        alone = make_controller(1, rtf=0.9).level()
+        queued = make_controller(2, rtf=0.9).level()
+        fast = make_controller(2, rtf=0.2).level()
+
+        # Скользящее среднее: один быстрый прогон не сбрасывает медленную историю
+        controller = make_controller(2, rtf=0.9)
+        controller.observe(100.0, 10.0)
+        smoothed = controller.rtf
+
+        if (alone, queued, fast) == (0, 1, 0) and abs(smoothed - 0.74) < 1e-9:
+            print(f"✅ Тест пройден: RTF после сглаживания {smoothed:.2f}")
+            return True
+        else:
+            print(f"❌ Тест провален: {alone}, {queued}, {fast}, {smoothed}")
+            return False
+
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def test_opt_out_and_cap():
+    """Клиент может отказаться от деградации, max_level ограничивает её сверху"""
+    print("\n🛑 Тестирование отказа от деградации и предела уровня...")
+
+    try:
+        overloaded = make_controller(30, rtf=2.0)
+        capped = make_controller(30, rtf=2.0, max_level=1)
+        disabled = make_controller(30, rtf=2.0, max_level=0)
+
+        names = [
+            overloaded.choose().name,
+            overloaded.choose(allow_degrade=False).name,
+            capped.choose().name,
+            disabled.choose().name,
+        ]
+        economy = overloaded.choose()
+
+        if names == ["economy", "full", "greedy", "full"] and economy.model == "medium" and economy.beam_size == 1:
+            print(f"✅ Тест пройден: {names}")
+            return True
+        else:
+            print(f"❌ Тест провален: {names}, {economy}")
+            return False
+
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def main():
+    print("🧪 Автономный тест снижения качества под нагрузкой")
+    print("=" * 50)
+
+    tests = [
+        test_level_by_queue,
+        test_level_by_rtf,
+        test_opt_out_and_cap
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test in tests:
+        if test():
+            passed += 1
+
+    print("\n" + "=" * 50)
+    print(f"📊 Результат: {passed}/{total} тестов пройдено")
+
+    if passed == total:
+        print("🎉 Все тесты пройдены! Управление нагрузкой работает корректно.")
+        return True
+    else:
+        print("❌ Некоторые тесты провалены. Проверьте реализацию load_control.")
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
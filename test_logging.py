@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Автономный тест структурированного логирования
+"""
+
+import io
+import sys
+import atexit
+import json
+import logging
+from log_utils import ContextFilter, setup_logging, job_id_var, UVICORN_LOGGERS
+
+def capture_logs(emit, sample_rate=1.0):
+    """Настраивает логирование с выводом в буфер, вызывает emit и возвращает JSON-записи"""
+    stderr, buffer = sys.stderr, io.StringIO()
+    sys.stderr = buffer
+    try:
+        listener = setup_logging("INFO", "json", sample_rate)
+    finally:
+        sys.stderr = stderr
+    emit()
+    # stop дожидается, пока поток записи опустошит очередь; повторный stop при выходе упал бы
+    listener.stop()
+    atexit.unregister(listener.stop)
+    return [json.loads(line) for line in buffer.getvalue().splitlines()]
+
+def test_job_sampling():
+    """Задача попадает в выборку целиком, WARNING и выше проходят всегда"""
+    print("🎲 Тестирование сэмплирования по задачам...")
+
+    sampler = ContextFilter(sample_rate=0.3)
+
+    def record(level):
+        return logging.LogRecord("test", level, __file__, 0, "msg", None, None)
+
+    try:
+        kept, whole, warnings = 0, True, True
+        for index in range(2000):
+            token = job_id_var.set(f"job{index:05d}")
+            decisions = {sampler.filter(record(logging.INFO)) for _ in range(5)}
+            whole &= len(decisions) == 1
+            kept += decisions == {True}
+            warnings &= sampler.filter(record(logging.WARNING)) and sampler.filter(record(logging.ERROR))
+            job_id_var.reset(token)
+
+        share = kept / 2000
+        if whole and warnings and 0.25 < share < 0.35:
+            print(f"✅ Тест пройден: в выборке {share:.0%} задач")
+            return True
+        else:
+            print(f"❌ Тест провален: целиком {whole}, WARNING {warnings}, доля {share:.2f}")
+            return False
+
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def test_json_records():
+    """Поля extra - ключи верхнего уровня, traceback - в exc, а не в msg"""
+    print("\n🧾 Тестирование JSON-записей...")
+
+    logger = logging.getLogger("test")
+
+    def emit():
+        token = job_id_var.set("abc123")
+        logger.info("Этап завершён", extra={"stage": "read", "bytes": 5})
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            logger.error("Ошибка %s", "обработки", exc_info=True)
+        job_id_var.reset(token)
+
+    try:
+        stage, error = capture_logs(emit)
+
+        if stage["stage"] == "read" and stage["bytes"] == 5 and stage["job_id"] == "abc123" \
+                and error["msg"] == "Ошибка обработки" and "ZeroDivisionError" in error["exc"] \
+                and "Traceback" not in error["msg"]:
+            print("✅ Тест пройден")
+            return True
+        else:
+            print(f"❌ Тест провален: {stage}, {error}")
+            return False
+
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def test_uvicorn_loggers():
+    """Логгеры uvicorn теряют свои обработчики и пишут через общую очередь"""
+    print("\n🦄 Тестирование логгеров uvicorn...")
+
+    # Так их настраивает uvicorn до импорта приложения
+    for name in UVICORN_LOGGERS:
+        server_logger = logging.getLogger(name)
+        server_logger.addHandler(logging.StreamHandler(io.StringIO()))
+        server_logger.propagate = False
+
+    def emit():
+        logging.getLogger("uvicorn.access").info('%s - "%s %s HTTP/%s" %d', "127.0.0.1:1", "POST", "/x", "1.1", 200)
+
+    try:
+        records = capture_logs(emit)
+        moved = all(
+            not logging.getLogger(name).handlers and logging.getLogger(name).propagate
+            for name in UVICORN_LOGGERS
+        )
+
+        if moved and [r["logger"] for r in records] == ["uvicorn.access"] and "POST /x" in records[0]["msg"]:
+            print("✅ Тест пройден")
+            return True
+        else:
+            print(f"❌ Тест провален: обработчики убраны {moved}, записи {records}")
+            return False
+
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def main():
+    print("🧪 Автономный тест структурированного логирования")
+    print("=" * 50)
+
+    tests = [
+        test_job_sampling,
+        test_json_records,
+        test_uvicorn_loggers
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test in tests:
+        if test():
+            passed += 1
+
+    print("\n" + "=" * 50)
+    print(f"📊 Результат: {passed}/{total} тестов пройдено")
+
+    if passed == total:
+        print("🎉 Все тесты пройдены! Логирование работает корректно.")
+        return True
+    else:
+        print("❌ Некоторые тесты провалены. Проверьте реализацию log_utils.")
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Автономный тест постобработки транскрипта
+"""
+
+import time
+from postprocess import (
+    Segment, TranscriptPostprocessor, remove_repeats, merge_paragraphs, clean_punctuation
+)
+
+def test_repeated_segments():
+    """Зацикленные сегменты схлопываются в одну копию"""
+    print("🔁 Тестирование удаления повторов сегментов...")
+
+    segments = [Segment(0, 2, " Начнём лекцию.")]
+    segments += [Segment(2 + i, 3 + i, " Спасибо за внимание.") for i in range(10)]
+
+    try:
+        result, removed = remove_repeats(segments)
+        texts = [segment.text.strip() for segment in result]
+
+        if texts == ["Начнём лекцию.", "Спасибо за внимание."] and removed == 27:
+            print(f"✅ Тест пройден: удалено {removed} слов")
+            return True
+        else:
+            print(f"❌ Тест провален: {texts}")
+            return False
+
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def test_legitimate_repeats_kept():
+    """Короткие осмысленные повторы не трогаются"""
+    print("\n🗣️  Тестирование сохранения допустимых повторов...")
+
+    segments = [Segment(0, 2, " Это очень очень важно, да, да.")]
+
+    try:
+        result, removed = remove_repeats(segments, max_repeats=2)
+
+        if removed == 0 and result == segments:
+            print("✅ Тест пройден: текст не изменён")
+            return True
+        else:
+            print(f"❌ Тест провален: {result}")
+            return False
+
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def test_paragraphs_by_pause():
+    """Абзац разрывается только на длинной паузе после конца предложения"""
+    print("\n📄 Тестирование разбиения на абзацы...")
+
+    segments = [
+        Segment(0.0, 2.0, " Первая мысль"),
+        Segment(5.0, 7.0, " продолжается здесь."),
+        Segment(10.0, 12.0, " Вторая мысль."),
+    ]
+
+    try:
+        paragraphs = merge_paragraphs(segments, pause=2.0)
+
+        if paragraphs == ["Первая мысль продолжается здесь.", "Вторая мысль."]:
+            print(f"✅ Тест пройден: {len(paragraphs)} абзаца")
+            return True
+        else:
+            print(f"❌ Тест провален: {paragraphs}")
+            return False
+
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def test_punctuation():
+    """Пробелы и знаки препинания нормализуются"""
+    print("\n✏️  Тестирование чистки пунктуации...")
+
+    try:
+        text = clean_punctuation("  итак ,  начнём,,с основ !!Это 3.14 ....")
+
+        if text == "Итак, начнём, с основ! Это 3.14...":
+            print("✅ Тест пройден")
+            return True
+        else:
+            print(f"❌ Тест провален: {text!r}")
+            return False
+
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def test_long_transcript():
+    """40-минутная лекция обрабатывается быстро"""
+    print("\n⏱️  Тестирование скорости на длинном транскрипте...")
+
+    # ~7000 слов - типичный объём 40-минутной лекции
+    segments = [
+        Segment(i * 4.0, i * 4.0 + 3.5, f" Предложение номер {i} о теме {i % 37} и выводах {i * 7}.")
+        for i in range(700)
+    ]
+
+    try:
+        started = time.perf_counter()
+        text, stats = TranscriptPostprocessor().run(segments)
+        elapsed = time.perf_counter() - started
+
+        if elapsed < 1.0 and stats["removed_words"] == 0 and text:
+            print(f"✅ Тест пройден: {elapsed * 1000:.0f} мс, этапы: {stats}")
+            return True
+        else:
+            print(f"❌ Тест провален: {elapsed:.2f} с, {stats}")
+            return False
+
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def main():
+    print("🧪 Автономный тест постобработки транскрипта")
+    print("=" * 50)
+
+    tests = [
+        test_repeated_segments,
+        test_legitimate_repeats_kept,
+        test_paragraphs_by_pause,
+        test_punctuation,
+        test_long_transcript
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test in tests:
+        if test():
+            passed += 1
+
+    print("\n" + "=" * 50)
+    print(f"📊 Результат: {passed}/{total} тестов пройдено")
+
+    if passed == total:
+        print("🎉 Все тесты пройдены! Постобработка работает корректно.")
+        return True
+    else:
+        print("❌ Некоторые тесты провалены. Проверьте реализацию postprocess.")
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Автономный тест профилирования запросов
+"""
+
+import os
+import json
+import time
+import pstats
+import tempfile
+from profiling import JobProfile, ProfileSwitch
+
+# Этапы запроса с предобработкой на уровне модуля, как в app.py: имя этапа -
+# __qualname__ функции, а README ссылается на 02_transcribe.pstats
+def decrypt_data():
+    time.sleep(0.01)
+
+def preprocess_wav():
+    time.sleep(0.01)
+
+def transcribe():
+    time.sleep(0.02)
+
+def test_profile_switch():
+    """Профиль создаётся только по верному токену, в открытом окне или всегда"""
+    print("🎛️  Тестирование включения профилирования...")
+
+    directory = tempfile.mkdtemp()
+    switch = ProfileSwitch("secret", directory)
+
+    try:
+        results = [
+            ProfileSwitch(None, directory).start("job", "secret"),
+            switch.start("job"),
+            switch.start("job", "wrong"),
+            switch.start("job", "secret"),
+            ProfileSwitch(None, directory, always=True).start("job"),
+        ]
+        switch.open_window(60)
+        in_window = switch.start("job")
+        switch.open_window(-1)
+        closed = switch.start("job")
+
+        started = [result is not None for result in results]
+        if started == [False, False, False, True, True] and isinstance(in_window, JobProfile) \
+                and closed is None and results[3].job_id == "job" and results[3].directory == directory:
+            print("✅ Тест пройден")
+            return True
+        else:
+            print(f"❌ Тест провален: {started}, окно {in_window}, после окна {closed}")
+            return False
+
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def test_stage_timing():
+    """Этап записывает wall и cpu: ожидание попадает только в wall"""
+    print("\n⏱️  Тестирование времени этапа...")
+
+    profile = JobProfile("job", tempfile.mkdtemp(), interval=0.001)
+
+    def busy():
+        deadline = time.thread_time() + 0.05
+        while time.thread_time() < deadline:
+            pass
+
+    try:
+        result = profile.run_stage("sleep", lambda value: time.sleep(0.1) or value, 42)
+        profile.run_stage("busy", busy)
+        sleep, spin = profile.stages
+
+        if result == 42 and sleep["stage"] == "sleep" and sleep["wall_ms"] >= 100 and sleep["cpu_ms"] < 50 \
+                and spin["cpu_ms"] >= 50 and spin["wall_ms"] >= spin["cpu_ms"] - 1 and profile.samples:
+            print(f"✅ Тест пройден: {sleep}, {spin}")
+            return True
+        else:
+            print(f"❌ Тест провален: {result}, {profile.stages}")
+            return False
+
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def test_profile_save():
+    """save() пишет summary.json, stacks.folded и .pstats по этапам в порядке вызова"""
+    print("\n💾 Тестирование сохранения профиля...")
+
+    profile = JobProfile("job42", tempfile.mkdtemp(), interval=0.001)
+
+    try:
+        for func in (decrypt_data, preprocess_wav, transcribe):
+            profile.wrap(func)()
+        path = profile.save()
+
+        with open(os.path.join(path, "summary.json")) as f:
+            summary = json.load(f)
+        with open(os.path.join(path, "stacks.folded")) as f:
+            folded = f.read().splitlines()
+        names = sorted(name for name in os.listdir(path) if name.endswith(".pstats"))
+        stats = pstats.Stats(os.path.join(path, "02_transcribe.pstats"))
+
+        expected = ["00_decrypt_data.pstats", "01_preprocess_wav.pstats", "02_transcribe.pstats"]
+        stages = [stage["stage"] for stage in summary["stages"]]
+        if names == expected and stages == ["decrypt_data", "preprocess_wav", "transcribe"] \
+                and summary["job_id"] == "job42" and summary["samples"] == sum(int(line.rsplit(" ", 1)[1]) for line in folded) \
+                and any(func[2] == "transcribe" for func in stats.stats) and path.endswith("job42"):
+            print(f"✅ Тест пройден: {names}")
+            return True
+        else:
+            print(f"❌ Тест провален: {names}, {stages}, {summary}")
+            return False
+
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def main():
+    print("🧪 Автономный тест профилирования запросов")
+    print("=" * 50)
+
+    tests = [
+        test_profile_switch,
+        test_stage_timing,
+        test_profile_save
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test in tests:
+        if test():
+            passed += 1
+
+    print("\n" + "=" * 50)
+    print(f"📊 Результат: {passed}/{total} тестов пройдено")
+
+    if passed == total:
+        print("🎉 Все тесты пройдены! Профилирование работает корректно.")
+        return True
+    else:
+        print("❌ Некоторые тесты провалены. Проверьте реализацию profiling.")
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Автономный тест проверки готовности
+"""
+
+import os
+import asyncio
+from crypto_utils import encrypt_data, decrypt_data
+from keyring_utils import KeyContext
+from readiness import ReadinessProbe
+
+KEY = KeyContext("probe", "default", os.urandom(32), os.urandom(32))
+
+def make_probe(delay=0.0, error=None, clip_seconds=0.5, **thresholds):
+    """Проверка с конвейером без модели: ждёт delay и шифрует ответ, как сервер"""
+    async def pipeline(encrypted_audio):
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        decrypt_data(encrypted_audio, KEY.decrypt_key)
+        return encrypt_data("текст".encode("utf-8"), KEY.encrypt_key, KEY.key_id)
+
+    thresholds.setdefault("max_latency", 60)
+    thresholds.setdefault("max_rtf", 100)
+    return ReadinessProbe(pipeline, key_provider=lambda: KEY, clip_seconds=clip_seconds, **thresholds)
+
+def test_before_first_run():
+    """До первого прогона сервис не готов"""
+    print("🕐 Тестирование состояния до первого прогона...")
+
+    try:
+        ready, result = make_probe().status()
+
+        if ready is False and result == {"ready": False, "error": "probe has not run yet"}:
+            print("✅ Тест пройден")
+            return True
+        else:
+            print(f"❌ Тест провален: {ready}, {result}")
+            return False
+
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def test_thresholds():
+    """Готовность требует укладываться и в задержку, и в RTF"""
+    print("\n📏 Тестирование порогов задержки и RTF...")
+
+    try:
+        fast = make_probe()
+        asyncio.run(fast.run_once())
+        # 0,1 с на клип 0,5 с: задержка выше 0,05 с, RTF 0,2 выше 0,1
+        slow = make_probe(delay=0.1, max_latency=0.05)
+        asyncio.run(slow.run_once())
+        high_rtf = make_probe(delay=0.1, max_rtf=0.1)
+        asyncio.run(high_rtf.run_once())
+        within = make_probe(delay=0.1, max_latency=1, max_rtf=0.5)
+        asyncio.run(within.run_once())
+
+        ready = [probe.status()[0] for probe in (fast, slow, high_rtf, within)]
+        result = within.status()[1]
+        if ready == [True, False, False, True] and 0.2 <= result["rtf"] < 0.5 \
+                and result["max_latency_seconds"] == 1 and result["max_rtf"] == 0.5:
+            print(f"✅ Тест пройден: {result['latency_seconds']} с, RTF {result['rtf']}")
+            return True
+        else:
+            print(f"❌ Тест провален: {ready}, {result}")
+            return False
+
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def test_stale_result():
+    """Успешный результат старше трёх интервалов даёт 503, сам результат не меняется"""
+    print("\n🧊 Тестирование устаревшего результата...")
+
+    probe = make_probe(interval=1.0, max_latency=2.0)
+
+    try:
+        asyncio.run(probe.run_once())
+        fresh = probe.status()[0]
+        # Зависший цикл проверки: последний прогон был 3 * 1 + 2 с назад и чуть раньше
+        probe.last["checked_at"] -= 5.5
+        ready, result = probe.status()
+
+        if fresh and ready is False and result["error"] == "probe result is stale" \
+                and result["ready"] is False and probe.last["ready"] is True:
+            print("✅ Тест пройден")
+            return True
+        else:
+            print(f"❌ Тест провален: {fresh}, {ready}, {result}")
+            return False
+
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def test_pipeline_failure():
+    """Исключение конвейера или нерасшифровываемый ответ - не готов, ошибка в результате"""
+    print("\n💥 Тестирование сбоя конвейера...")
+
+    async def garbage(encrypted_audio):
+        return b"not a ciphertext"
+
+    try:
+        crashed = make_probe(error=RuntimeError("CUDA out of memory"))
+        asyncio.run(crashed.run_once())
+        broken = ReadinessProbe(garbage, key_provider=lambda: KEY, clip_seconds=0.5)
+        asyncio.run(broken.run_once())
+
+        ready, result = crashed.status()
+        if ready is False and result["error"] == "CUDA out of memory" and "checked_at" in result \
+                and "latency_seconds" not in result and broken.status()[0] is False and broken.last["error"]:
+            print("✅ Тест пройден")
+            return True
+        else:
+            print(f"❌ Тест провален: {result}, {broken.last}")
+            return False
+
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def main():
+    print("🧪 Автономный тест проверки готовности")
+    print("=" * 50)
+
+    tests = [
+        test_before_first_run,
+        test_thresholds,
+        test_stale_result,
+        test_pipeline_failure
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test in tests:
+        if test():
+            passed += 1
+
+    print("\n" + "=" * 50)
+    print(f"📊 Результат: {passed}/{total} тестов пройдено")
+
+    if passed == total:
+        print("🎉 Все тесты пройдены! Проверка готовности работает корректно.")
+        return True
+    else:
+        print("❌ Некоторые тесты провалены. Проверьте реализацию readiness.")
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
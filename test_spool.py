@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Автономный тест временных файлов с аудио
+"""
+
+import os
+import time
+import tempfile
+import spool
+from spool import Spool, SPOOL_PREFIX
+
+def make_spool(min_free=1 << 20):
+    """Spool с «памятью» во временном каталоге, чтобы тест не зависел от tmpfs"""
+    s = Spool(memory_dir=None, disk_dir=tempfile.mkdtemp(), min_free=min_free)
+    s.memory_dir = tempfile.mkdtemp()
+    return s
+
+def test_memory_or_disk():
+    """tmpfs выбирается, пока хватает памяти и места, иначе диск"""
+    print("🧠 Тестирование выбора памяти или диска...")
+
+    s = make_spool(min_free=1 << 20)
+    original = spool.memory_available
+
+    try:
+        spool.memory_available = lambda: 1 << 30
+        plenty = s.choose(1 << 20)[1]
+        too_big = s.choose(1 << 62)[1]
+        spool.memory_available = lambda: (1 << 20) + 1000
+        pressure = s.choose(4096)[1]
+        spool.memory_available = lambda: None
+        unknown = s.choose(4096)[1]
+        no_tmpfs = Spool(memory_dir=None, disk_dir=s.disk_dir).choose(10)[1]
+
+        if [plenty, too_big, pressure, unknown, no_tmpfs] == ["memory", "disk", "disk", "memory", "disk"]:
+            print("✅ Тест пройден")
+            return True
+        else:
+            print(f"❌ Тест провален: {[plenty, too_big, pressure, unknown, no_tmpfs]}")
+            return False
+
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+    finally:
+        spool.memory_available = original
+
+def test_anonymous_file():
+    """Записанный файл читается с начала и не виден в каталоге"""
+    print("\n👻 Тестирование безымянного файла...")
+
+    s = make_spool()
+
+    try:
+        f, kind = s.write(b"RIFF" + b"\0" * 1000)
+        with f:
+            content = f.read()
+            listing = os.listdir(s.memory_dir) + os.listdir(s.disk_dir)
+
+        if content[:4] == b"RIFF" and len(content) == 1004 and listing == []:
+            print(f"✅ Тест пройден: {kind}")
+            return True
+        else:
+            print(f"❌ Тест провален: {len(content)} байт, в каталоге {listing}")
+            return False
+
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def test_reclaim_orphans():
+    """Уборка удаляет только старые файлы спула и прежних версий"""
+    print("\n🧹 Тестирование уборки осиротевших файлов...")
+
+    s = make_spool()
+    old = time.time() - 3600
+
+    try:
+        names = {
+            s.memory_dir: [SPOOL_PREFIX + "old", "temp_audio_abc.wav", "keep.txt"],
+            s.disk_dir: [SPOOL_PREFIX + "fresh", "temp_audio_old.wav"],
+        }
+        for directory, files in names.items():
+            for name in files:
+                path = os.path.join(directory, name)
+                with open(path, "wb") as f:
+                    f.write(b"x")
+                if name != SPOOL_PREFIX + "fresh":
+                    os.utime(path, (old, old))
+
+        removed = s.reclaim_orphans(min_age=60)
+        left = sorted(os.listdir(s.memory_dir) + os.listdir(s.disk_dir))
+
+        if removed == 3 and left == ["keep.txt", SPOOL_PREFIX + "fresh"]:
+            print(f"✅ Тест пройден: удалено {removed}")
+            return True
+        else:
+            print(f"❌ Тест провален: удалено {removed}, осталось {left}")
+            return False
+
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def test_cgroup_limit():
+    """Остаток до лимита cgroup v2 учитывает вытесняемый кэш; без лимита - None"""
+    print("\n📦 Тестирование лимита памяти cgroup...")
+
+    directory = tempfile.mkdtemp()
+
+    try:
+        def write(name, text):
+            with open(os.path.join(directory, name), "w") as f:
+                f.write(text)
+
+        write("memory.max", "1073741824\n")
+        write("memory.current", "805306368\n")
+        write("memory.stat", "anon 500000000\ninactive_file 104857600\nactive_file 1\n")
+        limited = spool._cgroup_available(directory)
+        write("memory.max", "max\n")
+        unlimited = spool._cgroup_available(directory)
+
+        if limited == (256 + 100) << 20 and unlimited is None:
+            print(f"✅ Тест пройден: {limited >> 20} МБ")
+            return True
+        else:
+            print(f"❌ Тест провален: {limited}, {unlimited}")
+            return False
+
+    except Exception as e:
+        print(f"❌ Ошибка теста: {e}")
+        return False
+
+def main():
+    print("🧪 Автономный тест временных файлов")
+    print("=" * 50)
+
+    tests = [
+        test_memory_or_disk,
+        test_anonymous_file,
+        test_reclaim_orphans,
+        test_cgroup_limit
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test in tests:
+        if test():
+            passed += 1
+
+    print("\n" + "=" * 50)
+    print(f"📊 Результат: {passed}/{total} тестов пройдено")
+
+    if passed == total:
+        print("🎉 Все тесты пройдены! Временные файлы работают корректно.")
+        return True
+    else:
+        print("❌ Некоторые тесты провалены. Проверьте реализацию spool.")
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)